@@ -1,17 +1,22 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import Tuple, Dict, List, Optional, Type, Union
+import bcrypt
 import hashlib
+import hmac
 from enum import Enum
 from datetime import datetime
+import itertools
 import logging
 import os
+import threading
 import pandas as pd
 import pickle
 
 
 # Constants
 TAX_RATE = 0.18
+STORAGE_DIR = os.environ.get("STORAGE_DIR", "storage")  # Directory holding the persisted pickle files.
 
 # Configure logging to report warnings and errors during operations.
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +35,8 @@ class Furniture():
         price (float): The base price before discounts/taxes.
         dimensions (Tuple[float, ...]): Dimensions (e.g., width, depth, height).
     """
+    __slots__ = ("id", "name", "description", "price", "dimensions")
+
     def __init__(self, id: int, name: str, description: str, price: float, dimensions: Tuple[float, ...]) -> None:
         """
         Initialize a Furniture instance.
@@ -89,6 +96,8 @@ class Chair(Furniture):
     Attributes:
         cushion_material (str): The material used for the chair's cushion.
     """
+    __slots__ = ("cushion_material",)
+
     def __init__(self, id: int, name: str, description: str, price: float, dimensions: Tuple[float, ...], cushion_material: str) -> None:
         super().__init__(id, name, description, price, dimensions)
         self.cushion_material = cushion_material
@@ -107,6 +116,8 @@ class Table(Furniture):
     Attributes:
         frame_material (str): The material used for the table frame.
     """
+    __slots__ = ("frame_material",)
+
     def __init__(self, id: int, name: str, description: str, price: float, dimensions: Tuple[float, ...], frame_material: str) -> None:
         super().__init__(id, name, description, price, dimensions)
         self.frame_material = frame_material
@@ -125,6 +136,8 @@ class Sofa(Furniture):
     Attributes:
         capacity (int): Number of people who can sit on the sofa.
     """
+    __slots__ = ("capacity",)
+
     def __init__(self, id: int, name: str, description: str, price: float, dimensions: Tuple[float, ...], capacity: int) -> None:
         super().__init__(id, name, description, price, dimensions)
         self.capacity = capacity
@@ -143,6 +156,8 @@ class Lamp(Furniture):
     Attributes:
         light_source (str): The type of light (e.g., LED, fluorescent).
     """
+    __slots__ = ("light_source",)
+
     def __init__(self, id: int, name: str, description: str, price: float, dimensions: Tuple[float, ...], light_source: str) -> None:
         super().__init__(id, name, description, price, dimensions)
         self.light_source = light_source
@@ -161,6 +176,8 @@ class Shelf(Furniture):
     Attributes:
         wall_mounted (bool): True if the shelf is wall-mounted.
     """
+    __slots__ = ("wall_mounted",)
+
     def __init__(self, id: int, name: str, description: str, price: float, dimensions: Tuple[float, ...], wall_mounted: bool) -> None:
         super().__init__(id, name, description, price, dimensions)
         self.wall_mounted = wall_mounted
@@ -188,7 +205,9 @@ class Inventory:
         if Inventory._instance is not None:
             raise Exception("Inventory is a singleton. Use Inventory.get_instance() instead.")
         self.items: Dict[Furniture, int] = {}
-        self.next_furniture_id = 1
+        self._by_id: Dict[int, Furniture] = {}
+        self._id_counter = itertools.count(1)
+        self._id_lock = threading.Lock()
         # Load persistent inventory data on initialization
         self.load_inventory()
         Inventory._instance = self
@@ -202,13 +221,14 @@ class Inventory:
             Inventory()
         return Inventory._instance
 
-    def load_inventory(self, filename="inventory.pkl", storage_dir="storage") -> None:
+    def load_inventory(self, filename="inventory.pkl", storage_dir=STORAGE_DIR) -> None:
         """
         Load inventory data from a pickle file.
         """
         inventory_path = os.path.join(storage_dir, filename)
         if not os.path.exists(inventory_path) or os.path.getsize(inventory_path) == 0:
             self.items = {}
+            self._by_id = {}
             return
 
         try:
@@ -216,47 +236,58 @@ class Inventory:
             inventory_df = pd.read_pickle(inventory_path)
         except (EOFError, pickle.UnpicklingError):
             self.items = {}
+            self._by_id = {}
             return
 
-        # Update next_furniture_id based on the max id in the DataFrame
+        # Resume the id counter after the max id in the DataFrame
         if not inventory_df.empty:
             max_id = inventory_df["id"].max()
             if pd.notna(max_id):
-                self.next_furniture_id = int(max_id) + 1
+                self._id_counter = itertools.count(int(max_id) + 1)
 
-        # Rebuild the items dictionary
+        # Files saved before dimensions were split into columns hold them as one column of tuples.
+        if "dimensions" in inventory_df.columns:
+            inventory_df[["dim_w", "dim_h", "dim_d"]] = pd.DataFrame(
+                inventory_df["dimensions"].tolist(), index=inventory_df.index
+            ).reindex(columns=range(3))
+
+        # Rebuild the items dictionary, one plain dict per row instead of a boxed Series.
         self.items = {}  # Ensure items is a dictionary.
-        for _, row in inventory_df.iterrows():
-            furniture_class_name = row["class"]
-            obj = None
-            if furniture_class_name == "Chair":
-                extra = row.get("cushion_material", "default_cushion")
-                obj = Chair(row["id"], row["name"], row["description"], row["price"], tuple(row["dimensions"]), extra)
-            elif furniture_class_name == "Table":
-                extra = row.get("frame_material", "default_frame")
-                obj = Table(row["id"], row["name"], row["description"], row["price"], tuple(row["dimensions"]), extra)
-            elif furniture_class_name == "Sofa":
-                extra = row.get("capacity", 1)
-                obj = Sofa(row["id"], row["name"], row["description"], row["price"], tuple(row["dimensions"]), extra)
-            elif furniture_class_name == "Lamp":
-                extra = row.get("light_source", "default_light_source")
-                obj = Lamp(row["id"], row["name"], row["description"], row["price"], tuple(row["dimensions"]), extra)
-            elif furniture_class_name == "Shelf":
-                extra = row.get("wall_mounted", False)
-                obj = Shelf(row["id"], row["name"], row["description"], row["price"], tuple(row["dimensions"]), extra)
-            if obj is not None:
-                obj.id = row["id"]
-                self.items[obj] = row["quantity"]
+        for record in inventory_df.to_dict("records"):
+            furniture_class_name = record["class"]
+            if furniture_class_name not in FURNITURE_MAP:
+                continue
+            extra_field, default_val = FURNITURE_EXTRA_FIELDS[furniture_class_name]
+            obj = FURNITURE_MAP[furniture_class_name](
+                record["id"], record["name"], record["description"], record["price"],
+                self._saved_dimensions(record["dim_w"], record["dim_h"], record["dim_d"]),
+                record.get(extra_field, default_val),
+            )
+            self.items[obj] = record["quantity"]
+        self._by_id = {furniture.id: furniture for furniture in self.items}
 
+    @staticmethod
+    def _saved_dimensions(*values) -> Tuple[float, ...]:
+        """
+        Rebuild a dimensions tuple from its saved dim_w/dim_h/dim_d values.
 
+        Items with fewer than three dimensions are saved with the missing columns empty; those are
+        dropped again. An empty cell also turns its whole column into floats, so whole numbers are
+        turned back into ints.
+        """
+        dims = list(values)
+        while dims and pd.isna(dims[-1]):
+            dims.pop()
+        return tuple(int(v) if isinstance(v, float) and v.is_integer() else v for v in dims)
 
     def get_next_furniture_id(self) -> int:
         """
-        Return the current next_furniture_id and then increment it.
+        Return the next unused furniture id.
+
+        The counter is guarded by a lock so concurrent requests never receive the same id.
         """
-        current_id = self.next_furniture_id
-        self.next_furniture_id += 1
-        return current_id
+        with self._id_lock:
+            return next(self._id_counter)
     
     def add_item(self, furniture: Furniture, quantity: int = 1) -> None:
         """
@@ -266,6 +297,7 @@ class Inventory:
             self.items[furniture] += quantity
         else:
             self.items[furniture] = quantity
+            self._by_id[furniture.id] = furniture
 
     def remove_item(self, furniture: Furniture, quantity: int = 1) -> bool:
         """
@@ -280,6 +312,7 @@ class Inventory:
         self.items[furniture] -= quantity
         if self.items[furniture] <= 0:
             del self.items[furniture]
+            self._by_id.pop(furniture.id, None)
         return True
 
     def update_quantity(self, furniture: Furniture, new_quantity: int) -> bool:
@@ -292,6 +325,7 @@ class Inventory:
             return False
         if new_quantity <= 0:
             del self.items[furniture]
+            self._by_id.pop(furniture.id, None)
         else:
             self.items[furniture] = new_quantity
         return True
@@ -334,6 +368,17 @@ class Inventory:
         return results
 
 
+    def get_by_id(self, furniture_id: int) -> Optional[Furniture]:
+        """
+        Look up a furniture item by its id.
+
+        Uses the id index kept in step with `items` by add_item(), remove_item() and update_quantity();
+        code that deletes from `items` directly must pop the id from `_by_id` as well.
+
+        :return: The furniture item, or None if no item has this id.
+        """
+        return self._by_id.get(furniture_id)
+
     def get_quantity(self, furniture: Furniture) -> int:
         """
         Get the current quantity of a specific furniture item.
@@ -350,11 +395,12 @@ class User:
     Attributes:
         name (str): User's name.
         email (str): User's unique email address.
-        password_hash (str): SHA-256 hash of the user's password.
+        password_hash (str): bcrypt hash of the user's password.
         address (str): User's address.
         order_history (List[str]): History of the user's orders.
     """
     _users: Dict[str, User] = {}
+    _bcrypt_rounds = 10  # bcrypt work factor (log2 of the key-expansion rounds).
 
     def __init__(self, name: str, email: str, password_hash: str, address: str = "", order_history: Optional[List[str]] = None) -> None:
         """
@@ -385,6 +431,35 @@ class User:
         cls._users[email] = user
         return user
 
+    @classmethod
+    def register_users(cls, records: List[Dict[str, str]]) -> List[User]:
+        """
+        Register several users at once.
+
+        The whole batch is validated before anything is stored, so either every user is
+        registered or none is.
+
+        Args:
+            records (List[Dict[str, str]]): One dict per user with 'email', 'password' and
+                optionally 'name' and 'address'.
+
+        Returns:
+            List[User]: The registered users, in input order.
+        """
+        emails = [record["email"] for record in records]
+        seen = set()
+        for email in emails:
+            if email in cls._users or email in seen:
+                raise ValueError(f"User with email '{email}' already exists.")
+            seen.add(email)
+        hashes = [cls._hash_password(record["password"]) for record in records]
+        users = [
+            cls(record.get("name", ""), email, password_hash, record.get("address", ""))
+            for record, email, password_hash in zip(records, emails, hashes)
+        ]
+        cls._users.update(zip(emails, users))
+        return users
+
     @classmethod
     def login_user(cls, email: str, raw_password: str) -> Optional[User]:
         """
@@ -421,8 +496,12 @@ class User:
     def check_password(self, raw_password: str) -> bool:
         """
         Verify the provided password against the stored hash.
+        Hashes created before the switch to bcrypt are plain SHA-256 hex digests and are still accepted.
         """
-        return self._hash_password(raw_password) == self.password_hash
+        if self.password_hash.startswith("$2"):
+            return bcrypt.checkpw(raw_password.encode("utf-8"), self.password_hash.encode("utf-8"))
+        legacy_hash = hashlib.sha256(raw_password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(legacy_hash, self.password_hash)
 
     def update_profile(self, name: Optional[str] = None, address: Optional[str] = None) -> None:
         """
@@ -439,12 +518,12 @@ class User:
         """
         self.order_history.append(order_info)
 
-    @staticmethod
-    def _hash_password(raw_password: str) -> str:
+    @classmethod
+    def _hash_password(cls, raw_password: str) -> str:
         """
-        Generate a SHA-256 hash of the provided raw password.
+        Generate a salted bcrypt hash of the provided raw password.
         """
-        return hashlib.sha256(raw_password.encode("utf-8")).hexdigest()
+        return bcrypt.hashpw(raw_password.encode("utf-8"), bcrypt.gensalt(rounds=cls._bcrypt_rounds)).decode("utf-8")
     
 
     def get_order_history(self) -> list:
@@ -456,6 +535,18 @@ class User:
         """
         return self.order_history
 
+    def to_dict(self) -> dict:
+        """
+        Convert this User instance to a dictionary.
+        """
+        return {
+            "email": self.email,
+            "name": self.name,
+            "password_hash": self.password_hash,
+            "address": self.address,
+            "order_history": self.order_history
+        }
+
 # --------------------------------------------------------------------
 # CartComponent (Abstract Base Class)
 # --------------------------------------------------------------------
@@ -573,6 +664,18 @@ class CompositeItem(CartComponent):
             return
 
 
+    def remove_by_name(self, name: str) -> bool:
+        """
+        Remove the first child whose name matches, in a single pass over the children.
+
+        :return: True if a child was removed, otherwise False.
+        """
+        for index, child in enumerate(self._children):
+            if child.name == name:
+                del self._children[index]
+                return True
+        return False
+
     def get_price(self) -> float:
         """
         Calculate the total price of the composite item including tax.
@@ -759,9 +862,9 @@ class Checkout:
         # Try matching by id if the name is numeric.
         try:
             target_id = int(name)
-            for furniture_item in self.inventory.items.keys():
-                if hasattr(furniture_item, "id") and furniture_item.id == target_id:
-                    return furniture_item
+            furniture_item = self.inventory.get_by_id(target_id)
+            if furniture_item is not None:
+                return furniture_item
         except ValueError:
             pass  # Not an integer, proceed to match by name.
 
@@ -798,6 +901,9 @@ class Order:
         created_at (datetime): Timestamp when the order was created.
     """
     all_orders = []  # Class-level list to store all orders.
+    _orders_by_id: Dict[int, "Order"] = {}  # Index over all_orders keyed by order_id.
+    _id_counter = itertools.count(1)  # Monotonic source of order ids.
+    _id_lock = threading.Lock()
 
     def __init__(self, user: User, items: List[LeafItem], total_price: float, status: OrderStatus = OrderStatus.PENDING) -> None:
         """
@@ -814,8 +920,17 @@ class Order:
         self.total_price = total_price
         self.status = status
         self.created_at = datetime.now()
-        self.order_id = len(Order.all_orders) + 1  # Assign an order id.
-        Order.all_orders.append(self)
+        with Order._id_lock:
+            self.order_id = next(Order._id_counter)  # Assign an order id.
+            Order.all_orders.append(self)
+            Order._orders_by_id[self.order_id] = self
+
+    @classmethod
+    def get_order(cls, order_id: int) -> Optional["Order"]:
+        """
+        Retrieve an order by its id.
+        """
+        return cls._orders_by_id.get(order_id)
 
     def set_status(self, new_status: OrderStatus) -> None:
         """
@@ -863,4 +978,14 @@ FURNITURE_MAP = {
     "Sofa": Sofa,
     "Lamp": Lamp,
     "Shelf": Shelf,
-}
\ No newline at end of file
+}
+
+# Field (and its default) holding each furniture type's extra constructor argument, both in a
+# POST /api/inventory request body and in a saved inventory.
+FURNITURE_EXTRA_FIELDS = {
+    "Chair": ("cushion_material", "default_cushion"),
+    "Table": ("frame_material", "default_frame"),
+    "Sofa": ("capacity", 1),
+    "Lamp": ("light_source", "default_light_source"),
+    "Shelf": ("wall_mounted", False),
+}
@@ -1,21 +1,33 @@
-from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
+import atexit
+import hashlib
+import logging
+import operator
 import os
+import threading
 from typing import Union, Dict, List
+import orjson
 import pandas as pd
-from Catalog import Inventory, Chair, Table, Sofa, Lamp, Shelf , User , ShoppingCart, LeafItem , Checkout , Order , OrderStatus
+from Catalog import Inventory, User , ShoppingCart, LeafItem , Checkout , Order , OrderStatus, FURNITURE_MAP, FURNITURE_EXTRA_FIELDS, STORAGE_DIR
 import pickle
-# Define the storage directory
-storage_dir = "storage"
+# Define the storage directory (override with the STORAGE_DIR environment variable)
+storage_dir = STORAGE_DIR
 
 # Ensure the storage directory exists
 os.makedirs(storage_dir, exist_ok=True)
 
+# Column layout of the persisted inventory file. Dimensions are stored as three numeric columns
+# (width, height, depth) rather than one column of tuples.
+INVENTORY_COLUMNS = ["id", "name", "description", "price", "dim_w", "dim_h", "dim_d", "class", "quantity"]
+
 # List of required files and their default content
 files_with_defaults = {
     "orders.pkl": pd.DataFrame(columns=["order_id", "user_email", "items"]),
     "users.pkl": pd.DataFrame(columns=["email", "name", "password_hash", "address", "order_history"]),
     "cart.pkl": pd.DataFrame(columns=["user_email", "items"]),
-    "inventory.pkl": pd.DataFrame(columns=["id", "name", "description", "price", "dimensions", "class", "quantity"])
+    "inventory.pkl": pd.DataFrame(columns=INVENTORY_COLUMNS)
 }
 
 # Check and create files if they don't exist, and initialize with default data if empty
@@ -49,17 +61,77 @@ def safe_load_pickle(file_path: str, default_df: pd.DataFrame) -> pd.DataFrame:
             pickle.dump(default_df, f)
         return default_df
 
-# Load data with error handling
-orders_df = safe_load_pickle(os.path.join(storage_dir, "orders.pkl"), files_with_defaults["orders.pkl"])
-users_df = safe_load_pickle(os.path.join(storage_dir, "users.pkl"), files_with_defaults["users.pkl"])
-cart_df = safe_load_pickle(os.path.join(storage_dir, "cart.pkl"), files_with_defaults["cart.pkl"])
-furniture_df = safe_load_pickle(os.path.join(storage_dir, "inventory.pkl"), files_with_defaults["inventory.pkl"])
+# The persisted DataFrames are only loaded (with error handling) the first time one of these module
+# attributes is accessed, e.g. app.users_df, so importing the app does not unpickle them.
+_LAZY_FRAMES = {
+    "orders_df": "orders.pkl",
+    "users_df": "users.pkl",
+    "cart_df": "cart.pkl",
+    "furniture_df": "inventory.pkl",
+}
+
+def __getattr__(name: str) -> pd.DataFrame:
+    """
+    Load a persisted DataFrame on first access and cache it as a module attribute.
+    """
+    filename = _LAZY_FRAMES.get(name)
+    if filename is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    df = safe_load_pickle(os.path.join(storage_dir, filename), files_with_defaults[filename])
+    globals()[name] = df
+    return df
 
 
 # Initialize the Inventory singleton
 inventory: Inventory = Inventory.get_instance()
 shopping_carts: Dict[str, ShoppingCart] = {}
 
+# One re-entrant lock per shared store so threaded servers don't lose updates.
+# When an endpoint needs several, acquire them in this order: inventory, users, orders, carts.
+_inventory_lock = threading.RLock()
+_users_lock = threading.RLock()
+_orders_lock = threading.RLock()
+_carts_lock = threading.RLock()
+
+# Serialized list responses keyed by store name, as (generation, etag, body). Every write bumps the
+# store's generation, so an entry built before the write is never served again.
+_listing_cache: Dict[str, tuple] = {}
+_store_generation: Dict[str, int] = {"furniture": 0, "orders": 0, "users": 0}
+
+def _invalidate(*stores: str) -> None:
+    """
+    Mark the cached listings of the given stores as stale. Call while holding the store's lock.
+    """
+    for store in stores:
+        _store_generation[store] += 1
+
+def _snapshot_state() -> tuple:
+    """
+    Record which furniture items, users, orders and carts the in-memory stores hold right now.
+    Used by the test suite together with _reset_test_state().
+    """
+    with _inventory_lock, _users_lock, _orders_lock, _carts_lock:
+        return set(inventory.items), set(User._users), len(Order.all_orders), set(shopping_carts)
+
+def _reset_test_state(snapshot: tuple) -> None:
+    """
+    Drop every furniture item, user, order and cart added since _snapshot_state() returned `snapshot`.
+    Anything that was already there is left as it is.
+    """
+    furniture, users, order_count, carts = snapshot
+    with _inventory_lock, _users_lock, _orders_lock, _carts_lock:
+        for item in inventory.items.keys() - furniture:
+            del inventory.items[item]
+            inventory._by_id.pop(item.id, None)
+        for email in User._users.keys() - users:
+            del User._users[email]
+        for order in Order.all_orders[order_count:]:
+            Order._orders_by_id.pop(order.order_id, None)
+        del Order.all_orders[order_count:]
+        for email in shopping_carts.keys() - carts:
+            del shopping_carts[email]
+        _invalidate("furniture", "users", "orders")
+
 def custom_append(self, other: Union[Dict, List], ignore_index: bool = False) -> pd.DataFrame:
     """
     Custom implementation for DataFrame.append to support dictionaries and lists.
@@ -82,10 +154,137 @@ def custom_append(self, other: Union[Dict, List], ignore_index: bool = False) ->
 pd.DataFrame.append = custom_append
 
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, used by app.json.dumps and request.get_json alike.
+    Types orjson cannot encode natively fall back to Flask's default conversions.
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self.option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+def _json_response(obj):
+    """
+    Build a JSON response straight from orjson's bytes, skipping jsonify's str round trip.
+
+    Args:
+        obj: The JSON-serializable payload.
+
+    Returns:
+        Response: An application/json response with its Content-Length already known.
+    """
+    return app.response_class(app.json.dumps_bytes(obj), mimetype="application/json")
 
+# Fetches the shared Furniture fields in a single C-level call.
+_furniture_attrs = operator.attrgetter("id", "name", "description", "price", "dimensions")
 
-def save_orders(orders_df: pd.DataFrame, filename: str = "orders.pkl", storage_dir: str = "storage") -> None:
+def _furniture_row(furniture, quantity: int) -> dict:
+    """
+    Build the dictionary representation of a furniture item and its stock level.
+
+    Args:
+        furniture: The furniture instance.
+        quantity (int): The quantity of the item in stock.
+
+    Returns:
+        dict: The id, details, class name and quantity of the item.
+    """
+    furniture_id, name, description, price, dimensions = _furniture_attrs(furniture)
+    cls = type(furniture)
+    return {
+        "id": furniture_id,
+        "name": name,
+        "description": description,
+        "price": price,
+        "dimensions": dimensions,
+        "class": CLS_NAME.get(cls, cls.__name__),
+        "quantity": quantity
+    }
+
+def _cached_listing(store: str, lock, build_rows):
+    """
+    Serve a store's JSON listing from the cache, rebuilding it if the store changed since.
+
+    Args:
+        store (str): The store name used by the cache ("furniture", "orders" or "users").
+        lock: The store's lock, held while the listing is read and encoded.
+        build_rows: Callable returning an iterable of the rows to encode.
+
+    Returns:
+        Response: The listing with an ETag, or 304 Not Modified if the client's copy is current.
+    """
+    with lock:
+        generation = _store_generation[store]
+        cached = _listing_cache.get(store)
+        if cached is None or cached[0] != generation:
+            body = app.json.dumps_bytes(list(build_rows()))
+            cached = (generation, hashlib.md5(body, usedforsecurity=False).hexdigest(), body)
+            _listing_cache[store] = cached
+    response = app.response_class(cached[2], mimetype="application/json")
+    response.set_etag(cached[1])
+    return response.make_conditional(request)
+
+# Pickle writes run on a single background thread so requests don't wait on disk. Frames queued for
+# the same file are coalesced: only the most recent one is written.
+_persist_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+_pending_writes: Dict[str, pd.DataFrame] = {}
+_pending_lock = threading.Lock()
+atexit.register(_persist_pool.shutdown)
+
+def _write_pickle_atomic(df: pd.DataFrame, filepath: str) -> None:
+    """
+    Write a DataFrame to a pickle file via a temporary file, so readers never see a partial write.
+    The temporary file is removed if the write fails.
+    """
+    tmp_path = filepath + ".tmp"
+    try:
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, filepath)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _drain_pending_write(filepath: str) -> None:
+    """
+    Write the latest frame queued for filepath. Runs on the persistence thread.
+    """
+    with _pending_lock:
+        df = _pending_writes.pop(filepath)
+    try:
+        _write_pickle_atomic(df, filepath)
+    except Exception:
+        # Nothing reads the Future this runs in, so log here or the failure is lost.
+        logging.exception(f"Failed to persist {filepath}")
+
+def _schedule_write(df: pd.DataFrame, filepath: str) -> None:
+    """
+    Queue a DataFrame to be pickled to filepath, replacing any frame still waiting for that file.
+    """
+    with _pending_lock:
+        already_queued = filepath in _pending_writes
+        _pending_writes[filepath] = df
+    if not already_queued:
+        _persist_pool.submit(_drain_pending_write, filepath)
+
+def flush_persistence() -> None:
+    """
+    Block until every write queued so far has reached disk.
+    """
+    _persist_pool.submit(lambda: None).result()
+
+
+def save_orders(orders_df: pd.DataFrame, filename: str = "orders.pkl", storage_dir: str = STORAGE_DIR) -> None:
     """
     Persist the orders DataFrame to a pickle file.
     
@@ -105,7 +304,7 @@ def save_orders(orders_df: pd.DataFrame, filename: str = "orders.pkl", storage_d
     filepath = os.path.join(storage_dir, filename)
     orders_df.to_pickle(filepath)
 
-def save_users(users_dict: Dict[str, User], filename: str = "users.pkl", storage_dir: str = "storage") -> None:
+def save_users(users_dict: Dict[str, User], filename: str = "users.pkl", storage_dir: str = STORAGE_DIR) -> None:
     """
     Save the current users stored in the User._users dictionary to a pickle file.
     
@@ -118,21 +317,13 @@ def save_users(users_dict: Dict[str, User], filename: str = "users.pkl", storage
         os.makedirs(storage_dir)
     
     # Convert the users dictionary to a list of simple dictionaries.
-    users_list = []
-    for email, user in users_dict.items():
-        users_list.append({
-            "email": user.email,
-            "name": user.name,
-            "password_hash": user.password_hash,
-            "address": user.address,
-            "order_history": user.order_history
-        })
+    users_list = [user.to_dict() for user in users_dict.values()]
     
     users_df = pd.DataFrame(users_list)
     filepath = os.path.join(storage_dir, filename)
     users_df.to_pickle(filepath)
 
-def save_cart(shopping_carts: Dict[str, ShoppingCart], filename: str = "cart.pkl", storage_dir: str = "storage") ->None:
+def save_cart(shopping_carts: Dict[str, ShoppingCart], filename: str = "cart.pkl", storage_dir: str = STORAGE_DIR) ->None:
     """
     Persist the current shopping carts to a pickle file.
     
@@ -170,7 +361,7 @@ def save_cart(shopping_carts: Dict[str, ShoppingCart], filename: str = "cart.pkl
     filepath = os.path.join(storage_dir, filename)
     carts_df.to_pickle(filepath)
 
-def save_inventory(inventory_instance: inventory, filename: str = "inventory.pkl", storage_dir: str = "storage") -> pd.DataFrame:
+def save_inventory(inventory_instance: inventory, filename: str = "inventory.pkl", storage_dir: str = STORAGE_DIR) -> pd.DataFrame:
     """
     Persist the current inventory from the Inventory singleton to a pickle file.
 
@@ -185,27 +376,23 @@ def save_inventory(inventory_instance: inventory, filename: str = "inventory.pkl
         pd.DataFrame: The DataFrame created from the inventory data.
 
     This function converts the inventory data (stored as a dictionary mapping Furniture objects to their available quantities)
-    into a pandas DataFrame and saves it as a pickle file. It ensures that the storage directory exists before saving.
+    into a pandas DataFrame and queues it to be saved as a pickle file in the background (see flush_persistence).
+    It ensures that the storage directory exists before saving.
     """
-    if not os.path.exists(storage_dir):
-        os.makedirs(storage_dir)
-    
-    data = []
-    # Loop through each furniture item and its quantity to build a list of dictionaries.
-    for furniture, quantity in inventory_instance.items.items():
-        data.append({
-            "id": getattr(furniture, "id", None),
-            "name": getattr(furniture, "name", None),
-            "description": getattr(furniture, "description", None),
-            "price": getattr(furniture, "price", None),
-            "dimensions": getattr(furniture, "dimensions", None),
-            "class": furniture.__class__.__name__,
-            "quantity": quantity
-        })
+    os.makedirs(storage_dir, exist_ok=True)
 
-    inventory_df = pd.DataFrame(data)
-    filepath = os.path.join(storage_dir, filename)
-    inventory_df.to_pickle(filepath)
+    # Build one flat record per furniture item together with its quantity.
+    records = []
+    for furniture, quantity in inventory_instance.items.items():
+        furniture_id, name, description, price, dimensions = _furniture_attrs(furniture)
+        # Dimensions may hold any number of values; pad or trim them to the three saved columns.
+        width, height, depth = (*dimensions, None, None, None)[:3]
+        cls = type(furniture)
+        records.append((furniture_id, name, description, price, width, height, depth, CLS_NAME.get(cls, cls.__name__), quantity))
+
+    # Passing the columns up front skips key inference and keeps the schema for an empty inventory.
+    inventory_df = pd.DataFrame.from_records(records, columns=INVENTORY_COLUMNS)
+    _schedule_write(inventory_df, os.path.join(storage_dir, filename))
     
     return inventory_df
 
@@ -219,18 +406,10 @@ def get_furniture():
     List all furniture items from the inventory.
     Each entry includes the unique id, furniture details, and quantity in stock.
     """
-    items = []
-    for furniture, qty in inventory.items.items():
-        items.append({
-            "id": getattr(furniture, "id", None),
-            "name": furniture.name,
-            "description": furniture.description,
-            "price": furniture.price,
-            "dimensions": furniture.dimensions,
-            "class": furniture.__class__.__name__,
-            "quantity": qty
-        })
-    return jsonify(items), 200
+    return _cached_listing(
+        "furniture", _inventory_lock,
+        lambda: (_furniture_row(furniture, qty) for furniture, qty in inventory.items.items()),
+    )
 
 @app.route("/api/orders", methods=["GET"])
 def get_orders():
@@ -239,25 +418,14 @@ def get_orders():
     
     Returns a JSON list of all orders stored in Order.all_orders.
     """
-    orders_dict = [order.to_dict() for order in Order.all_orders]
-    return jsonify(orders_dict), 200
+    return _cached_listing("orders", _orders_lock, lambda: (order.to_dict() for order in Order.all_orders))
 
 @app.route("/api/users", methods=["GET"])
 def get_users():
     """
     Retrieve all users from the User class storage.
     """
-    users = []
-    # Iterate over the internal _users dict
-    for email, user in User._users.items():
-        users.append({
-            "email": user.email,
-            "name": user.name,
-            "password_hash": user.password_hash,
-            "address": user.address,
-            "order_history": user.order_history
-        })
-    return jsonify(users), 200
+    return _cached_listing("users", _users_lock, lambda: (user.to_dict() for user in User._users.values()))
 
 # Helper function to locate a furniture item by its ID in the Inventory
 def get_furniture_item_by_id(furniture_id: int):
@@ -270,7 +438,7 @@ def get_furniture_item_by_id(furniture_id: int):
     Returns:
         The furniture item if found; otherwise, None.
     """
-    return next((item for item in inventory.items.keys() if getattr(item, "id", None) == furniture_id), None)
+    return inventory.get_by_id(furniture_id)
 
 @app.route("/api/inventory/<int:furniture_id>/quantity", methods=["GET"])
 def get_quantity_for_item(furniture_id: int):
@@ -281,10 +449,10 @@ def get_quantity_for_item(furniture_id: int):
     """
     furniture_item = get_furniture_item_by_id(furniture_id)
     if not furniture_item:
-        return jsonify({"error": "Furniture item not found"}), 404
+        return _json_response({"error": "Furniture item not found"}), 404
 
     quantity = inventory.get_quantity(furniture_item)
-    return jsonify({"id": furniture_id, "quantity": quantity}), 200
+    return _json_response({"id": furniture_id, "quantity": quantity}), 200
 
 @app.route("/api/cart/<string:email>/view", methods=["GET"])
 def view_cart_endpoint(email: str):
@@ -294,12 +462,12 @@ def view_cart_endpoint(email: str):
     This endpoint uses the ShoppingCart.view_cart() method (from Catalog.py) to obtain a string
     representing the cart contents. If no cart exists for the user, a 404 error is returned.
     """
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user"}), 404
+    cart = shopping_carts.get(email)
+    if cart is None:
+        return _json_response({"error": "Shopping cart not found for user"}), 404
 
-    cart = shopping_carts[email]
     cart_contents = cart.view_cart()
-    return jsonify({"cart": cart_contents}), 200
+    return _json_response({"cart": cart_contents}), 200
 
 @app.route("/api/checkout/<string:email>/validate", methods=["GET"])
 def validate_cart_endpoint(email: str):
@@ -311,18 +479,18 @@ def validate_cart_endpoint(email: str):
     in sufficient quantity.
     """
     # Check if the user exists.
-    if email not in User._users:
-        return jsonify({"error": "User not found"}), 404
+    user = User.get_user(email)
+    if user is None:
+        return _json_response({"error": "User not found"}), 404
 
     # Check if the shopping cart exists for this user.
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user"}), 404
+    cart = shopping_carts.get(email)
+    if cart is None:
+        return _json_response({"error": "Shopping cart not found for user"}), 404
 
-    user = User._users[email]
-    cart = shopping_carts[email]
     checkout_obj = Checkout(user, cart, inventory)
     is_valid = checkout_obj.validate_cart()
-    return jsonify({"cart_valid": is_valid}), 200
+    return _json_response({"cart_valid": is_valid}), 200
 
 @app.route("/api/checkout/<string:email>/leaf_items", methods=["GET"])
 def get_leaf_items(email: str):
@@ -333,15 +501,15 @@ def get_leaf_items(email: str):
     on the shopping cart's root, returning a JSON list of leaf items (for debugging purposes).
     """
     # Check that the user exists.
-    if email not in User._users:
-        return jsonify({"error": "User not found"}), 404
+    user = User.get_user(email)
+    if user is None:
+        return _json_response({"error": "User not found"}), 404
 
     # Check that the shopping cart exists for this user.
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user"}), 404
+    cart = shopping_carts.get(email)
+    if cart is None:
+        return _json_response({"error": "Shopping cart not found for user"}), 404
 
-    user = User._users[email]
-    cart = shopping_carts[email]
     checkout_obj = Checkout(user, cart, inventory)
     
     # Call the private method _collect_leaf_items on the cart's root.
@@ -356,7 +524,7 @@ def get_leaf_items(email: str):
             "total_price": item.get_price()
         })
     
-    return jsonify({"leaf_items": items_list}), 200
+    return _json_response({"leaf_items": items_list}), 200
 
 @app.route("/api/checkout/<string:email>/find_furniture", methods=["GET"])
 def find_furniture_by_name_endpoint(email: str):
@@ -366,36 +534,28 @@ def find_furniture_by_name_endpoint(email: str):
     Expects a query parameter "name" with the furniture's name.
     """
     # Verify that the user exists.
-    if email not in User._users:
-        return jsonify({"error": "User not found"}), 404
+    user = User.get_user(email)
+    if user is None:
+        return _json_response({"error": "User not found"}), 404
 
     # Verify that the shopping cart exists for this user.
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user"}), 404
+    cart = shopping_carts.get(email)
+    if cart is None:
+        return _json_response({"error": "Shopping cart not found for user"}), 404
 
     # Get the furniture name from the query parameters.
     furniture_name = request.args.get("name")
     if not furniture_name:
-        return jsonify({"error": "Missing 'name' query parameter"}), 400
+        return _json_response({"error": "Missing 'name' query parameter"}), 400
 
-    user = User._users[email]
-    cart = shopping_carts[email]
     checkout_obj = Checkout(user, cart, inventory)
     furniture_item = checkout_obj._find_furniture_by_name(furniture_name)
     if not furniture_item:
-        return jsonify({"error": "Furniture not found"}), 404
+        return _json_response({"error": "Furniture not found"}), 404
 
     # Build a response with furniture details.
-    response = {
-        "id": furniture_item.id,
-        "name": furniture_item.name,
-        "description": furniture_item.description,
-        "price": furniture_item.price,
-        "dimensions": furniture_item.dimensions,
-        "class": furniture_item.__class__.__name__,
-        "quantity": inventory.get_quantity(furniture_item)
-    }
-    return jsonify(response), 200
+    response = _furniture_row(furniture_item, inventory.get_quantity(furniture_item))
+    return _json_response(response), 200
 
 @app.route("/api/orders/<int:order_id>/status", methods=["GET"])
 def get_order_status(order_id: int):
@@ -409,11 +569,11 @@ def get_order_status(order_id: int):
         A JSON object containing the order_id and its status.
     """
     # Find the order by ID
-    order = next((o for o in Order.all_orders if o.order_id == order_id), None)
+    order = Order.get_order(order_id)
     if not order:
-        return jsonify({"error": "Order not found"}), 404
+        return _json_response({"error": "Order not found"}), 404
 
-    return jsonify({"order_id": order.order_id, "status": order.get_status().value}), 200
+    return _json_response({"order_id": order.order_id, "status": order.get_status().value}), 200
 
 @app.route("/api/users/<string:email>/order_history", methods=["GET"])
 def get_user_order_history(email: str):
@@ -426,8 +586,8 @@ def get_user_order_history(email: str):
     """
     user = User.get_user(email)
     if not user:
-        return jsonify({"error": "User not found"}), 404
-    return jsonify({"email": user.email, "order_history": user.get_order_history()}), 200
+        return _json_response({"error": "User not found"}), 404
+    return _json_response({"email": user.email, "order_history": user.get_order_history()}), 200
 
 
 
@@ -471,7 +631,7 @@ def inventory_search():
             "quantity": inventory.get_quantity(item)
         })
 
-    return jsonify(output), 200
+    return _json_response(output), 200
 
 @app.route("/api/users", methods=["POST"])
 def register_user():
@@ -481,25 +641,46 @@ def register_user():
     data = request.get_json() or {}
     email = data.get("email")
     if not email:
-        return jsonify({"error": "Missing email"}), 400
+        return _json_response({"error": "Missing email"}), 400
     password = data.get("password", "")
     if not password:
-        return jsonify({"error": "Missing password"}), 400
+        return _json_response({"error": "Missing password"}), 400
     name = data.get("name", "")
     address = data.get("address", "")
 
-    try:
-        new_user = User.register_user(name, email, password, address)
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 400
-
-    return jsonify({
-        "email": new_user.email,
-        "name": new_user.name,
-        "password_hash": new_user.password_hash,
-        "address": new_user.address,
-        "order_history": new_user.order_history
-    }), 201
+    with _users_lock:
+        try:
+            new_user = User.register_user(name, email, password, address)
+        except ValueError as e:
+            return _json_response({"error": str(e)}), 400
+        _invalidate("users")
+
+    return _json_response(new_user.to_dict()), 201
+
+@app.route("/api/users/bulk", methods=["POST"])
+def register_users_bulk():
+    """
+    Register several users in one request using the User.register_users class method.
+    Expects a JSON payload with a list of users under 'users'; nothing is stored if any entry is invalid.
+    """
+    data = request.get_json() or {}
+    records = data.get("users")
+    if not isinstance(records, list) or not records:
+        return _json_response({"error": "users must be a non-empty list"}), 400
+    for record in records:
+        if not isinstance(record, dict) or not record.get("email"):
+            return _json_response({"error": "Missing email"}), 400
+        if not record.get("password"):
+            return _json_response({"error": "Missing password"}), 400
+
+    with _users_lock:
+        try:
+            new_users = User.register_users(records)
+        except ValueError as e:
+            return _json_response({"error": str(e)}), 400
+        _invalidate("users")
+
+    return _json_response([user.to_dict() for user in new_users]), 201
 
 @app.route("/api/login", methods=["POST"])
 def login():
@@ -512,11 +693,11 @@ def login():
     email = data.get("email")
     password = data.get("password")
     if not email or not password:
-        return jsonify({"error": "Email and password required."}), 400
+        return _json_response({"error": "Email and password required."}), 400
     user = User.login_user(email, password)
     if not user:
-        return jsonify({"error": "Invalid email or password."}), 401
-    return jsonify({
+        return _json_response({"error": "Invalid email or password."}), 401
+    return _json_response({
         "email": user.email,
         "name": user.name,
         "address": user.address,
@@ -537,26 +718,27 @@ def check_password(email: str):
     data = request.get_json() or {}
     candidate = data.get("password")
     if not candidate:
-        return jsonify({"error": "Missing password"}), 400
+        return _json_response({"error": "Missing password"}), 400
     user = User.get_user(email)
     if not user:
-        return jsonify({"error": "User not found"}), 404
+        return _json_response({"error": "User not found"}), 404
     is_correct = user.check_password(candidate)
-    return jsonify({"password_correct": is_correct}), 200
+    return _json_response({"password_correct": is_correct}), 200
 
 @app.route("/api/hash_password", methods=["POST"])
 def hash_password():
     """
-    Generate a SHA-256 hash for the provided password.
+    Generate a bcrypt hash for the provided password.
     
-    Expects a JSON payload with 'password' and returns the hashed password.
+    Expects a JSON payload with 'password' and returns the hashed password. The hash is salted,
+    so hashing the same password twice gives different results.
     """
     data = request.get_json() or {}
     raw_password = data.get("password")
     if not raw_password:
-        return jsonify({"error": "Missing password"}), 400
+        return _json_response({"error": "Missing password"}), 400
     hashed = User._hash_password(raw_password)
-    return jsonify({"hashed_password": hashed}), 200
+    return _json_response({"hashed_password": hashed}), 200
 
 @app.route("/api/orders", methods=["POST"])
 def create_order():
@@ -572,56 +754,51 @@ def create_order():
     # Retrieve the user instance.
     user = User.get_user(user_email)
     if not user:
-        return jsonify({"error": "User not found"}), 404
+        return _json_response({"error": "User not found"}), 404
 
     items = data.get("items", [])
     if not isinstance(items, list):
-        return jsonify({"error": "items must be a list"}), 400
+        return _json_response({"error": "items must be a list"}), 400
     if not items:
-        return jsonify({"error": "Order items cannot be empty"}), 400
-
-    leaf_items = []
-    total_price = 0.0
-
-    # Validate each order item against the inventory.
-    for order_item in items:
-        furniture_id = order_item.get("furniture_id")
-        order_quantity = order_item.get("quantity", 1)
-        found = None
-        if not isinstance(inventory.items, dict):
-            return jsonify({"error": "Inventory is not properly initialized"}), 500
-        for furniture in inventory.items.keys():
-            if getattr(furniture, "id", None) == furniture_id:
-                if not furniture.check_availability(): # Ensure no zero-quantity items
-                    return jsonify({"error": f"Furniture '{furniture.name}' is not available"}), 400
-                if inventory.items[furniture] < order_quantity:
-                    return jsonify({"error": f"Not enough quantity for furniture with id {furniture_id}"}), 400
-                found = furniture
-                break
-        if not found:
-            return jsonify({"error": f"Furniture with id {furniture_id} does not exist"}), 404
-
-        # Create a LeafItem for the furniture.
-        leaf_item = LeafItem(found.name, found.price, quantity=order_quantity)
-        leaf_items.append(leaf_item)
-        total_price += leaf_item.get_price()
-
-    # Create the Order. It is automatically stored in Order.all_orders.
-    new_order = Order(user, leaf_items, total_price, status=OrderStatus.PENDING)
+        return _json_response({"error": "Order items cannot be empty"}), 400
+
+    with _inventory_lock, _users_lock, _orders_lock:
+        leaf_items = []
+        # Quantity requested per furniture item, so repeated lines are checked against stock together.
+        requested: Dict[object, int] = {}
+
+        # Validate each order item against the inventory.
+        for order_item in items:
+            furniture_id = order_item.get("furniture_id")
+            order_quantity = order_item.get("quantity", 1)
+            if not isinstance(inventory.items, dict):
+                return _json_response({"error": "Inventory is not properly initialized"}), 500
+            found = get_furniture_item_by_id(furniture_id)
+            if not found:
+                return _json_response({"error": f"Furniture with id {furniture_id} does not exist"}), 404
+            if not found.check_availability(): # Ensure no zero-quantity items
+                return _json_response({"error": f"Furniture '{found.name}' is not available"}), 400
+            requested[found] = requested.get(found, 0) + order_quantity
+            if inventory.items[found] < requested[found]:
+                return _json_response({"error": f"Not enough quantity for furniture with id {furniture_id}"}), 400
+
+            # Create a LeafItem for the furniture.
+            leaf_items.append(LeafItem(found.name, found.price, quantity=order_quantity))
+
+        total_price = sum(leaf_item.get_price() for leaf_item in leaf_items)
+
+        # Create the Order. It is automatically stored in Order.all_orders.
+        new_order = Order(user, leaf_items, total_price, status=OrderStatus.PENDING)
     
-    # Update inventory: subtract purchased quantities.
-    for order_item in items:
-        furniture_id = order_item.get("furniture_id")
-        order_quantity = order_item.get("quantity", 1)
-        for furniture in list(inventory.items.keys()):
-            if getattr(furniture, "id", None) == furniture_id:
-                inventory.items[furniture] -= order_quantity
-                break
-
-    # Update the user's order history.
-    user.add_order(str(new_order))
+        # Update inventory: subtract purchased quantities, reusing the items resolved above.
+        for furniture, quantity in requested.items():
+            inventory.items[furniture] -= quantity
+
+        # Update the user's order history.
+        user.add_order(str(new_order))
+        _invalidate("furniture", "users", "orders")
     
-    return jsonify(new_order.to_dict()), 201
+    return _json_response(new_order.to_dict()), 201
 
 @app.route("/api/users/<email>/profile", methods=["POST"])
 def update_profile(email: str):
@@ -629,18 +806,14 @@ def update_profile(email: str):
     Update an existing user's profile.
     """
     data = request.get_json() or {}
-    user = User.get_user(email)
-    if not user:
-        return jsonify({"message": "No such user"}), 200
+    with _users_lock:
+        user = User.get_user(email)
+        if not user:
+            return _json_response({"message": "No such user"}), 200
 
-    user.update_profile(name=data.get("name"), address=data.get("address"))
-    return jsonify({
-        "email": user.email,
-        "name": user.name,
-        "password_hash": user.password_hash,
-        "address": user.address,
-        "order_history": user.order_history
-    }), 200
+        user.update_profile(name=data.get("name"), address=data.get("address"))
+        _invalidate("users")
+    return _json_response(user.to_dict()), 200
 
 @app.route("/api/checkout/<email>", methods=["POST"])
 def checkout(email: str):
@@ -655,26 +828,27 @@ def checkout(email: str):
     payment_method = data.get("payment_method")
     address = data.get("address")
     if not payment_method or not address:
-        return jsonify({"error": "Both payment_method and address are required."}), 400
+        return _json_response({"error": "Both payment_method and address are required."}), 400
 
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user."}), 404
-    if email not in User._users:
-        return jsonify({"error": "User not found."}), 404
+    with _inventory_lock, _users_lock, _orders_lock, _carts_lock:
+        cart = shopping_carts.get(email)
+        if cart is None:
+            return _json_response({"error": "Shopping cart not found for user."}), 404
+        user = User.get_user(email)
+        if user is None:
+            return _json_response({"error": "User not found."}), 404
 
-    cart = shopping_carts[email]
-    user = User._users[email]
-    
-    checkout_obj = Checkout(user, cart, inventory)
-    checkout_obj.set_payment_method(payment_method)
-    checkout_obj.set_address(address)
+        checkout_obj = Checkout(user, cart, inventory)
+        checkout_obj.set_payment_method(payment_method)
+        checkout_obj.set_address(address)
 
-    if not checkout_obj.finalize_order():
-        return jsonify({"error": "Checkout process failed. Check logs for details."}), 400
+        if not checkout_obj.finalize_order():
+            return _json_response({"error": "Checkout process failed. Check logs for details."}), 400
+        _invalidate("furniture", "users")
 
     # Assuming the user object stores order summaries in an 'orders' list.
     order_summary = checkout_obj.order_summary or "Order summary not available"
-    return jsonify({"message": "Order finalized successfully.", "order_summary": order_summary}), 200
+    return _json_response({"message": "Order finalized successfully.", "order_summary": order_summary}), 200
 
 @app.route("/api/cart/<string:email>/remove", methods=["POST"])
 def remove_cart_item(email: str):
@@ -687,29 +861,30 @@ def remove_cart_item(email: str):
     unit_price = data.get("unit_price")
     quantity = data.get("quantity")
     if not item_id:
-        return jsonify({"error": "Missing item_id in request data"}), 400
+        return _json_response({"error": "Missing item_id in request data"}), 400
     if unit_price is None:
-        return jsonify({"error": "Missing unit_price in request data"}), 400
+        return _json_response({"error": "Missing unit_price in request data"}), 400
     if quantity is None:
-        return jsonify({"error": "Missing quantity in request data"}), 400
+        return _json_response({"error": "Missing quantity in request data"}), 400
 
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user"}), 404
+    with _carts_lock:
+        cart = shopping_carts.get(email)
+        if cart is None:
+            return _json_response({"error": "Shopping cart not found for user"}), 404
 
-    # Create a LeafItem using the incoming data
-    leaf_item = LeafItem(
-        name=str(item_id),
-        unit_price=float(unit_price),
-        quantity=int(quantity)
-    )
+        # Create a LeafItem using the incoming data
+        leaf_item = LeafItem(
+            name=str(item_id),
+            unit_price=float(unit_price),
+            quantity=int(quantity)
+        )
 
-    cart = shopping_carts[email]
-    cart.remove_item(leaf_item)
+        cart.remove_item(leaf_item)
 
-    return jsonify({
-        "message": "Item removed from cart",
-        "total_price": cart.get_total_price()
-    }), 200
+        return _json_response({
+            "message": "Item removed from cart",
+            "total_price": cart.get_total_price()
+        }), 200
 
 @app.route("/api/checkout/<string:email>/payment", methods=["POST"])
 def process_payment_endpoint(email: str):
@@ -724,27 +899,27 @@ def process_payment_endpoint(email: str):
     It returns a JSON response indicating whether the payment was successful.
     """
     # Check that the user exists.
-    if email not in User._users:
-        return jsonify({"error": "User not found"}), 404
+    user = User.get_user(email)
+    if user is None:
+        return _json_response({"error": "User not found"}), 404
 
     # Check that the shopping cart exists for this user.
-    if email not in shopping_carts:
-        return jsonify({"error": "Shopping cart not found for user"}), 404
+    cart = shopping_carts.get(email)
+    if cart is None:
+        return _json_response({"error": "Shopping cart not found for user"}), 404
 
     data = request.get_json() or {}
     payment_method = data.get("payment_method")
     if not payment_method:
-        return jsonify({"error": "Payment method is required"}), 400
+        return _json_response({"error": "Payment method is required"}), 400
 
-    user = User._users[email]
-    cart = shopping_carts[email]
     checkout_obj = Checkout(user, cart, inventory)
     checkout_obj.set_payment_method(payment_method)
     payment_result = checkout_obj.process_payment()
     if payment_result:
-        return jsonify({"payment_success": True}), 200
+        return _json_response({"payment_success": True}), 200
     else:
-        return jsonify({"payment_success": False, "error": "Payment processing failed"}), 400
+        return _json_response({"payment_success": False, "error": "Payment processing failed"}), 400
 
 # ---------------------------
 # PUT Endpoints
@@ -762,54 +937,50 @@ def update_cart(email: str):
     
     items = data.get("items", [])
     if not isinstance(items, list):
-        return jsonify({"error": "items must be a list"}), 400
-
-    if email in shopping_carts:
-        cart = shopping_carts[email]
-    else:
-        cart = ShoppingCart(name=email)
-        shopping_carts[email] = cart
-
-    # Process each item in the request.
-    for item in items:
-        furniture_id = item.get("furniture_id")
-        quantity = item.get("quantity", 1)
-        discount = item.get("discount", 0)  # Default 0 if not provided
-
-        # Try to get the unit_price from the payload; if not provided, lookup from inventory.
-        unit_price = item.get("unit_price")
-        if unit_price is None:
-            # Lookup furniture in the inventory by matching id.
-            found = None
-            for furniture in inventory.items.keys():
-                if getattr(furniture, "id", None) == furniture_id:
-                    found = furniture
-                    break
-            if found:
-                unit_price = found.price
-            else:
-                return jsonify({"error": f"Product with id {furniture_id} does not exist in the inventory."}), 404
+        return _json_response({"error": "items must be a list"}), 400
+
+    with _inventory_lock, _carts_lock:
+        cart = shopping_carts.get(email)
+        if cart is None:
+            cart = ShoppingCart(name=email)
+            shopping_carts[email] = cart
+
+        # Process each item in the request.
+        for item in items:
+            furniture_id = item.get("furniture_id")
+            quantity = item.get("quantity", 1)
+            discount = item.get("discount", 0)  # Default 0 if not provided
+
+            # Try to get the unit_price from the payload; if not provided, lookup from inventory.
+            unit_price = item.get("unit_price")
+            if unit_price is None:
+                # Lookup furniture in the inventory by matching id.
+                found = get_furniture_item_by_id(furniture_id)
+                if found:
+                    unit_price = found.price
+                else:
+                    return _json_response({"error": f"Product with id {furniture_id} does not exist in the inventory."}), 404
         
-        # Create the LeafItem using the valid unit_price.
-        leaf_item = LeafItem(name=str(furniture_id), unit_price=float(unit_price), quantity=int(quantity))
-
-        try:
-            leaf_item.apply_discount(discount)
-        except ValueError as e:
-            # For example, discount > 100 raises ValueError. Return 400 with the error message.
-            return jsonify({"error": str(e)}), 400
+            # Create the LeafItem using the valid unit_price.
+            leaf_item = LeafItem(name=str(furniture_id), unit_price=float(unit_price), quantity=int(quantity))
+
+            try:
+                leaf_item.apply_discount(discount)
+            except ValueError as e:
+                # For example, discount > 100 raises ValueError. Return 400 with the error message.
+                return _json_response({"error": str(e)}), 400
         
-        cart.add_item(leaf_item)
-
-    total_price = cart.get_total_price()
-    response_items = []
-    for child in cart.root._children:
-        response_items.append({
-            "furniture_id": int(child.name),
-            "quantity": child.quantity
-        })
+            cart.add_item(leaf_item)
+
+        total_price = cart.get_total_price()
+        response_items = []
+        for child in cart.root._children:
+            response_items.append({
+                "furniture_id": int(child.name),
+                "quantity": child.quantity
+            })
 
-    return jsonify({"user_email": email, "items": response_items, "total_price": total_price}), 200
+        return _json_response({"user_email": email, "items": response_items, "total_price": total_price}), 200
 
 
 @app.route("/api/inventory/<int:furniture_id>", methods=["PUT"])
@@ -819,35 +990,29 @@ def update_inventory(furniture_id: int):
     Locate the item by its unique id (stored as an attribute).
     """
     data = request.get_json() or {}
-    found_item = None
-    for item in list(inventory.items.keys()):
-        if getattr(item, "id", None) == furniture_id:
-            found_item = item
-            break
-    if found_item is None:
-        return jsonify({"error": "Furniture item not found"}), 404
-
-    if "name" in data:
-        found_item.name = data["name"]
-    if "description" in data:
-        found_item.description = data["description"]
-    if "price" in data:
-        found_item.price = data["price"]
     if "dimensions" in data:
-        found_item.dimensions = tuple(data["dimensions"])
-    if "quantity" in data:
-        inventory.update_quantity(found_item, data["quantity"])
-
-    save_inventory(inventory)
-    return jsonify({
-        "id": found_item.id,
-        "name": found_item.name,
-        "description": found_item.description,
-        "price": found_item.price,
-        "dimensions": found_item.dimensions,
-        "class": found_item.__class__.__name__,
-        "quantity": inventory.items.get(found_item, 0)
-    }), 200
+        dims = data["dimensions"]
+        if not isinstance(dims, (list, tuple)) or len(dims) != 3:
+            return _json_response({"error": "dimensions must be length 3"}), 400
+    with _inventory_lock:
+        found_item = get_furniture_item_by_id(furniture_id)
+        if found_item is None:
+            return _json_response({"error": "Furniture item not found"}), 404
+
+        if "name" in data:
+            found_item.name = data["name"]
+        if "description" in data:
+            found_item.description = data["description"]
+        if "price" in data:
+            found_item.price = data["price"]
+        if "dimensions" in data:
+            found_item.dimensions = (dims[0], dims[1], dims[2])
+        if "quantity" in data:
+            inventory.update_quantity(found_item, data["quantity"])
+        _invalidate("furniture")
+
+        save_inventory(inventory)
+        return _json_response(_furniture_row(found_item, inventory.items.get(found_item, 0))), 200
 
 @app.route("/api/users/<email>/password", methods=["PUT"])
 def update_password(email: str):
@@ -859,12 +1024,14 @@ def update_password(email: str):
     data = request.get_json() or {}
     new_password = data.get("new_password")
     if not new_password:
-        return jsonify({"error": "Missing new_password"}), 400
-    user = User.get_user(email)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
-    user.set_password(new_password)
-    return jsonify({"message": "Password updated successfully"}), 200
+        return _json_response({"error": "Missing new_password"}), 400
+    with _users_lock:
+        user = User.get_user(email)
+        if not user:
+            return _json_response({"error": "User not found"}), 404
+        user.set_password(new_password)
+        _invalidate("users")
+    return _json_response({"message": "Password updated successfully"}), 200
 
 @app.route("/api/orders/<int:order_id>/status", methods=["PUT"])
 def update_order_status(order_id: int):
@@ -876,32 +1043,28 @@ def update_order_status(order_id: int):
     data = request.get_json() or {}
     new_status = data.get("status")
     if not new_status:
-        return jsonify({"error": "Missing status"}), 400
+        return _json_response({"error": "Missing status"}), 400
 
     # Find the order by ID
-    order = next((o for o in Order.all_orders if o.order_id == order_id), None)
-    if not order:
-        return jsonify({"error": "Order not found"}), 404
+    with _orders_lock:
+        order = Order.get_order(order_id)
+        if not order:
+            return _json_response({"error": "Order not found"}), 404
 
-    try:
-        order.set_status(OrderStatus(new_status))
-    except ValueError:
-        return jsonify({"error": "Invalid order status"}), 400
+        try:
+            order.set_status(OrderStatus(new_status))
+        except ValueError:
+            return _json_response({"error": "Invalid order status"}), 400
+        _invalidate("orders")
 
-    return jsonify({"message": "Order status updated successfully"}), 200
+    return _json_response({"message": "Order status updated successfully"}), 200
 
 # ---------------------------
 # POST Endpoint for Creating Furniture
 # ---------------------------
 
-# Map from string type to Furniture subclass.
-FURNITURE_MAP = {
-    "Chair": Chair,
-    "Table": Table,
-    "Sofa": Sofa,
-    "Lamp": Lamp,
-    "Shelf": Shelf,
-}
+# Inverse of FURNITURE_MAP, used to label furniture without reflecting on every object.
+CLS_NAME = {cls: name for name, cls in FURNITURE_MAP.items()}
 
 @app.route("/api/inventory", methods=["POST"])
 def create_furniture():
@@ -923,46 +1086,31 @@ def create_furniture():
     name = data.get("name", "")
     description = data.get("description", "")
     price = data.get("price", 0.0)
-    dimensions = tuple(data.get("dimensions", []))
+    dims = data.get("dimensions")
+    if not isinstance(dims, (list, tuple)) or len(dims) != 3:
+        return _json_response({"error": "dimensions must be length 3"}), 400
+    dimensions = (dims[0], dims[1], dims[2])
     quantity = data.get("quantity", 1)
 
 
     if ftype not in FURNITURE_MAP:
-        return jsonify({"error": f"Invalid furniture type: {ftype}"}), 400
+        return _json_response({"error": f"Invalid furniture type: {ftype}"}), 400
 
+    # Every subclass takes exactly one extra constructor argument, so pass it straight through.
     furniture_class = FURNITURE_MAP[ftype]
-    args = [id, name, description, price, dimensions]
-
-    # Map extra parameter requirements for each furniture type.
-    extra_field_defaults = {
-        "Chair": ("cushion_material", "default_cushion"),
-        "Table": ("frame_material", "default_frame"),
-        "Sofa": ("cushion_material", "default_cushion"),
-        "Lamp": ("light_source", "default_light_source"),
-        "Shelf": ("wall_mounted", "default_wall_mounted")
-    }
+    extra_field, default_val = FURNITURE_EXTRA_FIELDS[ftype]
+    if ftype == "Sofa" and extra_field not in data:
+        # Deprecated: Sofas were created from "cushion_material" before "capacity" was read.
+        default_val = data.get("cushion_material", default_val)
+    new_furniture = furniture_class(id, name, description, price, dimensions, data.get(extra_field, default_val))
+    with _inventory_lock:
+        new_furniture.id = inventory.get_next_furniture_id()
+        inventory.add_item(new_furniture, quantity)
+        _invalidate("furniture")
 
-    if ftype in extra_field_defaults:
-        extra_field, default_val = extra_field_defaults[ftype]
-        if extra_field:
-            extra_value = data.get(extra_field, default_val)
-            args.append(extra_value)
-
-    new_furniture = furniture_class(*args)
-    new_furniture.id = inventory.get_next_furniture_id()
-    inventory.add_item(new_furniture, quantity)
-
-    save_inventory(inventory)
-
-    return jsonify({
-        "id": new_furniture.id,
-        "name": new_furniture.name,
-        "description": new_furniture.description,
-        "price": new_furniture.price,
-        "dimensions": new_furniture.dimensions,
-        "class": new_furniture.__class__.__name__,
-        "quantity": quantity
-    }), 201
+        save_inventory(inventory)
+
+    return _json_response(_furniture_row(new_furniture, quantity)), 201
 
 # ---------------------------
 # DELETE Endpoints for Inventory, Cart, and Users
@@ -974,18 +1122,16 @@ def delete_inventory(furniture_id: int):
     
     Searches for the furniture item by its ID and removes it if found, then updates the inventory persistence.
     """
-    found_item = None
-    for item in list(inventory.items.keys()):
-        if getattr(item, "id", None) == furniture_id:
-            found_item = item
-            break
-    if found_item is None:
-        return jsonify({"error": "Furniture item not found"}), 404
+    with _inventory_lock:
+        found_item = get_furniture_item_by_id(furniture_id)
+        if found_item is None:
+            return _json_response({"error": "Furniture item not found"}), 404
     
-    current_qty = inventory.items.get(found_item, 0)
-    inventory.remove_item(found_item, quantity=current_qty)
-    save_inventory(inventory)
-    return jsonify({"message": "Furniture item deleted"}), 200
+        current_qty = inventory.items.get(found_item, 0)
+        inventory.remove_item(found_item, quantity=current_qty)
+        _invalidate("furniture")
+        save_inventory(inventory)
+    return _json_response({"message": "Furniture item deleted"}), 200
 
 @app.route("/api/cart/<email>/<item_id>", methods=["DELETE"])
 def delete_cart_item(email: str, item_id: int):
@@ -996,32 +1142,35 @@ def delete_cart_item(email: str, item_id: int):
     If found, the item is removed and the updated total cart price is returned.
     If not found, an error message is returned.
     """
-    if email not in shopping_carts:
-        return jsonify({"error": "Cart not found for user"}), 404
+    with _carts_lock:
+        cart = shopping_carts.get(email)
+        if cart is None:
+            return _json_response({"error": "Cart not found for user"}), 404
 
-    cart = shopping_carts[email]
-    # Attempt to remove the item with a matching furniture_id.
-    found = False
-    for child in cart.root._children:
-        if child.name == item_id:
-            cart.root.remove(child)
-            found = True
-            break
+        # Cart items are named after their furniture_id; normalise the route value once (e.g. "05" -> "5").
+        try:
+            target = str(int(item_id))
+        except ValueError:
+            target = item_id
 
-    if not found:
-        return jsonify({"error": "Item not found in cart"}), 404
+        # Attempt to remove the item with a matching furniture_id.
+        if not cart.root.remove_by_name(target):
+            return _json_response({"error": "Item not found in cart"}), 404
 
-    return jsonify({"message": "Item removed from cart", "total_price": cart.get_total_price()}), 200
+        return _json_response({"message": "Item removed from cart", "total_price": cart.get_total_price()}), 200
 
 @app.route("/api/users/<email>", methods=["DELETE"])
 def delete_user(email: str):
     """
     Delete a user via the User.delete_user class method.
     """
-    if not User.delete_user(email):
-        return jsonify({"error": "User not found"}), 404
-    return jsonify({"message": "User deleted"}), 200
+    with _users_lock:
+        if not User.delete_user(email):
+            return _json_response({"error": "User not found"}), 404
+        _invalidate("users")
+    return _json_response({"message": "User deleted"}), 200
 
 
 if __name__ == "__main__":  # pragma: no cover
+    # Development server only; in production run `gunicorn -c gunicorn.conf.py wsgi:application`.
     app.run(debug=True)
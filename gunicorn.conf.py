@@ -0,0 +1,15 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for serving the API.
+
+Users, orders, carts and the inventory live in process memory, so a second worker process would
+see a different copy of every store. Run a single worker and scale with threads instead; the
+endpoints serialize access to each store with their own locks.
+"""
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 2 * (os.cpu_count() or 1) + 1))
+timeout = 30
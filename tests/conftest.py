@@ -1,16 +1,206 @@
 # tests/conftest.py
+import itertools
 import pytest
+import shutil
 import sys
 import os
+import tempfile
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from app import app
+
+
+@pytest.fixture(scope="session")
+def app_mod():
+    """The app module, imported on first use rather than when test modules are collected."""
+    import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def _app(app_mod):
+    """The Flask app, configured once per test session."""
+    app_mod.app.config["TESTING"] = True
+    return app_mod.app
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _no_persistence(app_mod):
+    """
+    Drop the pickle writes queued by mutating endpoints for the whole session. Yields the real
+    app._schedule_write so real_persistence can put it back for the tests that check the files.
+    """
+    patch = pytest.MonkeyPatch()
+    real_schedule_write = app_mod._schedule_write
+    patch.setattr(app_mod, "_schedule_write", lambda df, filepath: None)
+    yield real_schedule_write
+    patch.undo()
 
 
 @pytest.fixture
-def client():
-    with app.test_client() as client:
+def real_persistence(app_mod, _no_persistence, monkeypatch):
+    """Let the app write its pickle files again for the duration of one test."""
+    monkeypatch.setattr(app_mod, "_schedule_write", _no_persistence)
+
+
+# Users registered once per session; tests that only need an existing account use these
+# instead of posting to /api/users themselves.
+SEED_USERS = [
+    {"email": "valid@example.com", "name": "Valid User", "password": "pass"},
+    {"email": "regression_validate@example.com", "name": "Regression Validate User", "password": "regpass"},
+]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def seed_users(app_mod):
+    """Register SEED_USERS in one batch before the first test runs."""
+    from Catalog import User
+
+    with app_mod._users_lock:
+        User.register_users(SEED_USERS)
+        app_mod._invalidate("users")
+
+
+@pytest.fixture(scope="session")
+def client(_app):
+    """One test client for the whole session; domain_state keeps the tests isolated."""
+    with _app.test_client() as client:
         yield client
 
+
+@pytest.fixture(scope="session")
+def call(_app):
+    """
+    Dispatch a request straight through the app inside a test request context, skipping the
+    werkzeug test Client and the WSGI environ it rebuilds for every call. Returns the response.
+
+    Pass a dict as `json`, or an already-encoded JSON body as `data` to skip serializing it again.
+    """
+    def _call(method, path, json=None, data=None):
+        if data is not None:
+            context = _app.test_request_context(path, method=method, data=data, content_type="application/json")
+        else:
+            context = _app.test_request_context(path, method=method, json=json)
+        with context:
+            return _app.full_dispatch_request()
+
+    return _call
+
+
+# Shared by every unique_email call in the process; xdist workers each hold their own stores.
+_email_counter = itertools.count()
+
+
+@pytest.fixture
+def unique_email():
+    """Factory for email addresses that no other test in this process uses: unique_email("prefix")."""
+    def _make(prefix="user"):
+        return f"{prefix}_{next(_email_counter)}@example.com"
+
+    return _make
+
+
+@pytest.fixture
+def registered_user(app_mod, unique_email):
+    """Register a fresh user directly in the user store and return their email."""
+    from Catalog import User
+
+    email = unique_email("registered")
+    with app_mod._users_lock:
+        User.register_users([{"email": email, "name": "Registered User", "password": "pass"}])
+        app_mod._invalidate("users")
+    return email
+
+
+@pytest.fixture
+def inventory_item(app_mod):
+    """
+    Factory that puts a furniture item of any type straight into the inventory, skipping the
+    POST /api/inventory round trip for tests that only need stock to exist. Returns the instance.
+
+    `extra` is the type's extra constructor argument (cushion material, light source, ...);
+    it defaults to the type's default in FURNITURE_EXTRA_FIELDS.
+    """
+    from Catalog import FURNITURE_EXTRA_FIELDS, FURNITURE_MAP
+
+    def _seed(kind="Chair", price=100.0, qty=5, name=None, dimensions=(40, 40, 90), extra=None):
+        if extra is None:
+            extra = FURNITURE_EXTRA_FIELDS[kind][1]
+        with app_mod._inventory_lock:
+            furniture = FURNITURE_MAP[kind](
+                app_mod.inventory.get_next_furniture_id(), name or f"Seed {kind}",
+                f"{kind} seeded for a test", price, dimensions, extra,
+            )
+            app_mod.inventory.add_item(furniture, qty)
+            app_mod._invalidate("furniture")
+        return furniture
+
+    return _seed
+
+
+@pytest.fixture
+def seed_chair(inventory_item):
+    """Factory for a seeded Chair: seed_chair(price=100.0, qty=5, name="Seed Chair")."""
+    def _seed(price=100.0, qty=5, name="Seed Chair"):
+        return inventory_item("Chair", price=price, qty=qty, name=name, extra="foam")
+
+    return _seed
+
+
+@pytest.fixture(scope="module")
+def sample_chair(app_mod):
+    """
+    One Chair shared by every test in a module that only puts it in a cart. Tests that
+    depend on its stock level or change it should seed their own with seed_chair.
+    """
+    from Catalog import Chair
+
+    with app_mod._inventory_lock:
+        chair = Chair(
+            app_mod.inventory.get_next_furniture_id(), "Shared Chair",
+            "Chair shared by a test module", 150.0, (50, 50, 100), "foam",
+        )
+        app_mod.inventory.add_item(chair, 100)
+        app_mod._invalidate("furniture")
+    yield chair
+    with app_mod._inventory_lock:
+        app_mod.inventory.items.pop(chair, None)
+        app_mod.inventory._by_id.pop(chair.id, None)
+        app_mod._invalidate("furniture")
+
+
+@pytest.fixture(autouse=True)
+def domain_state(app_mod):
+    """
+    Drop the users, carts, furniture and orders a test adds once it finishes.
+
+    Only keys created during the test are removed; anything that existed before
+    (including session-wide seed data) is left as it was.
+    """
+    snapshot = app_mod._snapshot_state()
+    yield
+    app_mod._reset_test_state(snapshot)
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", default=False, help="also run tests marked slow")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow test; pass --run-slow to run it")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
 def pytest_configure(config):
     config.addinivalue_line("markers", "regression: mark test as regression")
+    config.addinivalue_line("markers", "slow: end-to-end or disk round-trip test; skipped unless --run-slow is given")
+    # Persist into a throwaway directory instead of the tracked storage/ folder. Under pytest-xdist
+    # each worker process gets its own directory, so workers never write the same files.
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    config._storage_dir = tempfile.mkdtemp(prefix=f"storage-{worker}-")
+    os.environ["STORAGE_DIR"] = config._storage_dir
+
+def pytest_unconfigure(config):
+    storage_dir = getattr(config, "_storage_dir", None)
+    if storage_dir:
+        shutil.rmtree(storage_dir, ignore_errors=True)
@@ -1,120 +1,173 @@
+import os
+import orjson
 import pytest
-import app
 import pandas as pd
 
-@pytest.mark.parametrize("furniture_data", [
-    {"id": 1, "name": "Test Chair", "description": "Red chair", "price": 100.0, "dimensions": [40, 40, 90], "type": "Chair", "quantity": 5, "cushion_material": "foam"},
-    {"id": 2, "name": "Test Table", "description": "Blue table", "price": 250.0, "dimensions": [50, 50, 100], "type": "Table", "quantity": 3, "frame_material": "wood"},
-
-])
-def test_furniture_creation_and_retrieval(client, furniture_data):
+# Everything in this file is a regression test; `pytest -m "not regression"` skips it for quick runs.
+pytestmark = pytest.mark.regression
+
+# Base request body for creating a chair; tests override only the fields they care about.
+_CHAIR_BASE = {
+    "type": "Chair",
+    "name": "Regression Chair",
+    "description": "A chair for regression test",
+    "price": 100.0,
+    "dimensions": [40, 40, 90],
+    "quantity": 10,
+    "cushion_material": "foam"
+}
+# Request bodies that are sent unchanged are encoded once, at import.
+_CHAIR_BYTES = orjson.dumps(_CHAIR_BASE)
+
+_FURNITURE = {
+    "chair": {"id": 1, "name": "Test Chair", "description": "Red chair", "price": 100.0, "dimensions": [40, 40, 90], "type": "Chair", "quantity": 5, "cushion_material": "foam"},
+    "table": {"id": 2, "name": "Test Table", "description": "Blue table", "price": 250.0, "dimensions": [50, 50, 100], "type": "Table", "quantity": 3, "frame_material": "wood"},
+    "chair_without_id": {**_CHAIR_BASE, "name": "Reg Test Chair"},
+}
+_FURNITURE_BODIES = {key: orjson.dumps(furniture) for key, furniture in _FURNITURE.items()}
+
+_USERS = {
+    "user1": {"email": "user1@example.com", "name": "User One", "password": "pass1"},
+    "user2": {"email": "user2@example.com", "name": "User Two", "password": "pass2"},
+}
+_USER_BODIES = {key: orjson.dumps(user) for key, user in _USERS.items()}
+_PROFILE_UPDATE_BYTES = orjson.dumps({"name": "Updated Name", "address": "123 Regression Ave"})
+
+# Accounts registered by test_full_regression_flow.
+_REG_USER = orjson.dumps({"email": "regression@example.com", "name": "Regression Test1", "password": "regress123"})
+_ORDER_USER = orjson.dumps({"email": "orderuser@example.com", "name": "Order User", "password": "orderpassword"})
+_CART_UPDATE_USER = orjson.dumps({"email": "cartupdate@example.com", "name": "Cart Update User", "password": "cartpassword"})
+
+@pytest.fixture(params=list(_FURNITURE))
+def furniture_key(request):
+    return request.param
+
+def test_furniture_creation_and_retrieval(call, furniture_key):
     """Test that creating a furniture item via POST /api/inventory and retrieving it via GET /api/furniture works as expected."""
-    response = client.post("/api/inventory", json=furniture_data)
+    response = call("POST", "/api/inventory", data=_FURNITURE_BODIES[furniture_key])
     assert response.status_code == 201
     fid = response.get_json()["id"]
 
-    response = client.get("/api/furniture")
+    response = call("GET", "/api/furniture")
     assert response.status_code == 200
-    assert any(item["id"] == fid for item in response.get_json())
+    by_id = {item["id"]: item for item in orjson.loads(response.data)}
+    assert by_id[fid]["name"] == _FURNITURE[furniture_key]["name"]
 
-@pytest.mark.parametrize("user_data", [
-    {"email": "user1@example.com", "name": "User One", "password": "pass1"},
-    {"email": "user2@example.com", "name": "User Two", "password": "pass2"}
-])
+@pytest.fixture(params=list(_USERS))
+def user_key(request):
+    return request.param
 
-def test_user_registration_and_profile_update(client, user_data):
+def test_user_registration_and_profile_update(call, user_key):
     """Test that a user can be registered and then updated (profile changes) using the appropriate endpoints."""
-    response = client.post("/api/users", json=user_data)
+    response = call("POST", "/api/users", data=_USER_BODIES[user_key])
     assert response.status_code == 201
 
-    profile_update = {"name": "Updated Name", "address": "123 Regression Ave"}
-    response = client.post(f"/api/users/{user_data['email']}/profile", json=profile_update)
+    response = call("POST", f"/api/users/{_USERS[user_key]['email']}/profile", data=_PROFILE_UPDATE_BYTES)
     assert response.status_code == 200
     updated_user = response.get_json()
     assert updated_user["name"] == "Updated Name"
     assert updated_user["address"] == "123 Regression Ave"
 
-def test_invalid_order_creation(client):
+def test_invalid_order_creation(call):
     """Test that creating an order with empty items returns a 400 error."""
-    # Register a valid user.
-    client.post("/api/users", json={
-        "email": "valid@example.com",
-        "name": "Valid User",
-        "password": "pass"
-    })
-    response = client.post("/api/orders", json={"user_email": "valid@example.com", "items": []})
+    # valid@example.com is registered by the session seed_users fixture.
+    response = call("POST", "/api/orders", json={"user_email": "valid@example.com", "items": []})
     assert response.status_code == 400, "Order should fail when items are empty"
 
-def test_invalid_cart_update(client):
+def test_invalid_cart_update(call):
     """Test that updating a shopping cart for a non-existent user or invalid furniture returns a 404 error."""
-    response = client.put("/api/cart/invalid@example.com", json={"items": [{"furniture_id": 9999, "quantity": 1}]})
+    response = call("PUT", "/api/cart/invalid@example.com", json={"items": [{"furniture_id": 9999, "quantity": 1}]})
     assert response.status_code == 404, "Cart update should fail for non-existent furniture"
 
 
-def test_discount_application(client):
-    """Test that applying a discount to an inventory item and checking out works correctly."""
-    # First, register the user for discount application.
-    client.post("/api/users", json={
-        "email": "discount@example.com",
-        "name": "Discount User",
-        "password": "discountpass"
-    })
+@pytest.mark.parametrize("quantity, discount, expected_total, expected_remaining", [
+    (1, 0, 177.0, 9),   # plain checkout: 150 + 18% tax
+    (2, 25, 265.5, 8),  # 25% off each unit before tax
+], ids=["no_discount", "discount"])
+def test_checkout(call, seed_chair, registered_user, quantity, discount, expected_total, expected_remaining):
+    """
+    Checking out a cart charges the (discounted, taxed) cart total and takes the ordered quantity out of stock.
+    """
+    # Stock the item directly; only the cart and checkout endpoints are under test.
+    furniture_id = seed_chair(price=150.0, qty=10, name="Checkout Chair").id
 
-    # Create an inventory item first.
-    inv_response = client.post("/api/inventory", json={
-        "id": 3,
-        "name": "Discount Chair",
-        "description": "Discount test chair",
-        "price": 100.0, 
-        "dimensions": [40, 40, 90], 
-        "type": "Chair", 
-        "quantity": 10, 
-        "cushion_material": "foam"
+    response = call("PUT", f"/api/cart/{registered_user}", json={
+        "items": [{"furniture_id": furniture_id, "quantity": quantity, "discount": discount}]
     })
-    discount_item = inv_response.get_json()
-    discount_id = discount_item["id"]
-
-    discount_data = {"furniture_id": discount_id, "quantity": 2, "discount": 10}
-    email = "discount@example.com"
-    response = client.put(f"/api/cart/{email}", json={"items": [discount_data]})
     assert response.status_code == 200
 
-    response = client.post(f"/api/checkout/{email}", json={
+    response = call("POST", f"/api/checkout/{registered_user}", json={
         "payment_method": "PayPal",
         "address": "789 Discount Blvd"
     })
     assert response.status_code == 200
-
-def test_create_furniture_persistence(client):
+    data = response.get_json()
+    assert data["message"] == "Order finalized successfully."
+    assert f"Total: {expected_total:.2f}" in data["order_summary"]
+
+    response = call("GET", f"/api/inventory/{furniture_id}/quantity")
+    assert response.get_json()["quantity"] == expected_remaining
+
+_AUTOMATED_CHAIR = {
+    **_CHAIR_BASE,
+    "name": "Automated Test Chair",
+    "description": "A chair created during automated testing",
+    "price": 85.0,
+    "dimensions": [35, 35, 90],
+    "quantity": 7,
+    "cushion_material": "memory foam"
+}
+
+def test_create_furniture_persistence(call, app_mod, monkeypatch):
     """
-    Test that when create_furniture is called, the inventory persistence file is updated.
+    Test that when create_furniture is called, the inventory is queued for persistence.
     """
-    # Send POST request to create a new furniture item.
-    response = client.post(
-        "/api/inventory",
-        json={
-            "type": "Chair",
-            "name": "Automated Test Chair",
-            "description": "A chair created during automated testing",
-            "price": 85.0,
-            "dimensions": [35, 35, 90],
-            "quantity": 7,
-            "cushion_material": "memory foam"
-        }
-    )
-    # Assert that the response indicates success.
+    # Capture the frames handed to the background writer instead of letting them reach disk.
+    writes = []
+    monkeypatch.setattr(app_mod, "_schedule_write", lambda df, filepath: writes.append((filepath, df)))
+
+    response = call("POST", "/api/inventory", json=_AUTOMATED_CHAIR)
     assert response.status_code == 201, f"Expected 201, got {response.status_code}"
-    # Now, simulate a 'restart' by loading the persisted inventory file.
-    inventory_df = pd.read_pickle("storage/inventory.pkl")
 
-    # Verify that the DataFrame contains the new furniture item.
-    # For example, check that the new item is in the DataFrame by name.
+    filepath, inventory_df = writes[-1]
+    assert filepath == os.path.join(app_mod.storage_dir, "inventory.pkl")
     new_item = inventory_df[inventory_df["name"] == "Automated Test Chair"]
     assert not new_item.empty, "Automated Test Chair not found in the persisted inventory."
 
-@pytest.mark.regression
+@pytest.mark.slow
+def test_create_furniture_persistence_on_disk(call, app_mod, real_persistence, monkeypatch):
+    """
+    Test that when create_furniture is called, the inventory persistence file is updated.
+    """
+    path = os.path.join(app_mod.storage_dir, "inventory.pkl")
+    before = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    # Record the queued frame on its way to the real writer, so the file never has to be unpickled.
+    queued = []
+    write = app_mod._schedule_write
+    monkeypatch.setattr(app_mod, "_schedule_write", lambda df, filepath: (queued.append(df), write(df, filepath)))
+
+    response = call("POST", "/api/inventory", json=_AUTOMATED_CHAIR)
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+    app_mod.flush_persistence()
+
+    assert os.stat(path).st_mtime_ns != before, "inventory.pkl was not rewritten."
+    assert "Automated Test Chair" in set(queued[-1]["name"]), "Automated Test Chair not found in the persisted inventory."
+
+def test_inventory_pickle_roundtrip(app_mod, tmp_path):
+    """
+    A frame written by the persistence writer reads back unchanged, with no temporary file left behind.
+    """
+    df = pd.DataFrame.from_records(
+        [(1, "Roundtrip Chair", "One row", 50.0, 40, 40, 90, "Chair", 3)], columns=app_mod.INVENTORY_COLUMNS
+    )
+    path = tmp_path / "inventory.pkl"
+    app_mod._write_pickle_atomic(df, str(path))
 
-def test_full_regression_flow(client):
+    pd.testing.assert_frame_equal(pd.read_pickle(path), df)
+    assert [p.name for p in tmp_path.iterdir()] == ["inventory.pkl"]
+
+@pytest.mark.slow
+def test_full_regression_flow(call):
     """
     A regression test that exercises the entire flow:
         1. User registration
@@ -125,18 +178,11 @@ def test_full_regression_flow(client):
         6. Checking out
     """
     # --- User Registration for Regression Testing ---
-    reg_user_response = client.post(
-        "/api/users",
-        json={
-            "email": "regression@example.com",
-            "name": "Regression Test1",
-            "password": "regress123",
-        }
-    )
+    reg_user_response = call("POST", "/api/users", data=_REG_USER)
     assert reg_user_response.status_code == 201, "User registration should succeed."
 
     # --- Place an Order with Items Not in Inventory ---
-    res_furniture_not_in_inventory = client.post(
+    res_furniture_not_in_inventory = call("POST", 
         "/api/orders",
         json={
             "user_email": "regression@example.com",
@@ -151,24 +197,12 @@ def test_full_regression_flow(client):
    
 
     # --- Add Inventory: Regression Chair ---
-    inv_response = client.post(
-        "/api/inventory",
-        json={
-            "id": 1,
-            "type": "Chair",
-            "name": "Regression Chair",
-            "description": "A chair for regression test",
-            "price": 100.0,
-            "dimensions": [40, 40, 90],
-            "quantity": 10,
-            "cushion_material": "foam"
-        }
-    )
+    inv_response = call("POST", "/api/inventory", data=_CHAIR_BYTES)
     assert inv_response.status_code == 201, "Should successfully add regression chair to inventory."
     furniture_data = inv_response.get_json()
     furniture_id = furniture_data.get("id")
     # --- Place Order for an Item That Is in Inventory ---
-    res_furniture_in_inventory = client.post(
+    res_furniture_in_inventory = call("POST", 
         "/api/orders",
         json={
             "user_email": "regression@example.com",
@@ -178,16 +212,15 @@ def test_full_regression_flow(client):
     assert res_furniture_in_inventory.status_code == 201, "Valid order with existing item should succeed."
 
     # --- Add Inventory: Test Chair ---
-    test_chair_response = client.post(
+    test_chair_response = call("POST", 
         "/api/inventory",
         json={
-            "type": "Chair",
+            **_CHAIR_BASE,
             "name": "Test Chair",
             "description": "A test chair for order creation",
             "price": 75.0,
             "dimensions": [30, 30, 30],
-            "quantity": 5,
-            "cushion_material": "foam"
+            "quantity": 5
         }
     )
     assert test_chair_response.status_code == 201, "Furniture creation failed."
@@ -195,18 +228,11 @@ def test_full_regression_flow(client):
     furniture_id = furniture_data.get("id")
 
     # --- Register Order User ---
-    order_user_response = client.post(
-        "/api/users",
-        json={
-            "email": "orderuser@example.com",
-            "name": "Order User",
-            "password": "orderpassword",
-        }
-    )
+    order_user_response = call("POST", "/api/users", data=_ORDER_USER)
     assert order_user_response.status_code == 201, "Order user registration should succeed."
 
     # --- Create Order for Order User Using the Actual Furniture ID ---
-    order_response = client.post(
+    order_response = call("POST", 
         "/api/orders",
         json={
             "user_email": "orderuser@example.com",
@@ -216,18 +242,11 @@ def test_full_regression_flow(client):
     assert order_response.status_code == 201, "Order creation for existing user/furniture should succeed."
 
     # --- Register User for Cart Update and Checkout ---
-    cart_update_user_response = client.post(
-        "/api/users",
-        json={
-            "email": "cartupdate@example.com",
-            "name": "Cart Update User",
-            "password": "cartpassword"
-        }
-    )
+    cart_update_user_response = call("POST", "/api/users", data=_CART_UPDATE_USER)
     assert cart_update_user_response.status_code == 201, "Cart update user registration should succeed."
 
     # --- Search Inventory (for Chairs) ---
-    search_response = client.post(
+    search_response = call("POST", 
         "/api/inventorysearch",
         json={
             "name_substring": "Chair",
@@ -239,7 +258,7 @@ def test_full_regression_flow(client):
     assert search_response.status_code == 200, "Inventory search should succeed."
 
     # --- Add Inventory Item for Cart Update User Checkout ---
-    inventory_cart_response = client.post(
+    inventory_cart_response = call("POST", 
         "/api/inventory",
         json={
             "type": "Sofa",
@@ -248,7 +267,7 @@ def test_full_regression_flow(client):
             "price": 300.0,
             "dimensions": [200, 90, 100],
             "quantity": 5,
-            "cushion_material": "leather"
+            "capacity": 3
         }
     )
     inventory_cart_data = inventory_cart_response.get_json()
@@ -256,20 +275,20 @@ def test_full_regression_flow(client):
     assert inventory_cart_response.status_code == 201, "Should successfully add Sofa to inventory."
 
     # --- Update Shopping Cart for cartupdate@example.com ---
-    cart_response_initial = client.put(
+    cart_response_initial = call("PUT", 
         "/api/cart/cartupdate@example.com",
         json={"items": [{"furniture_id": furniture_id_cartupdate, "quantity": 3}]}
     )
     assert cart_response_initial.status_code == 200, "Initial cart update should succeed."
 
-    cart_response_updated = client.put(
+    cart_response_updated = call("PUT", 
         "/api/cart/cartupdate@example.com",
         json={"items": [{"furniture_id": furniture_id_cartupdate, "quantity": 5}]}
     )
     assert cart_response_updated.status_code == 200, "Cart update with new quantity should succeed."
 
     # Another cart update with explicit unit_price
-    cart_response_initial = client.put(
+    cart_response_initial = call("PUT", 
         "/api/cart/cartupdate@example.com",
         json={
             "items": [
@@ -283,7 +302,7 @@ def test_full_regression_flow(client):
     )
     assert cart_response_initial.status_code == 200, "Cart update with explicit unit_price should succeed."
 
-    cart_response_updated = client.put(
+    cart_response_updated = call("PUT", 
         "/api/cart/cartupdate@example.com",
         json={
             "items": [
@@ -298,7 +317,7 @@ def test_full_regression_flow(client):
     assert cart_response_updated.status_code == 200, "Cart update with changed unit_price should succeed."
 
     # --- Remove Item from Cart for cartupdate@example.com ---
-    remove_item_response = client.post(
+    remove_item_response = call("POST", 
         "/api/cart/cartupdate@example.com/remove",
         json={
             "item_id": furniture_id_cartupdate,
@@ -310,73 +329,30 @@ def test_full_regression_flow(client):
 
     # --- Checkout Process for cartupdate@example.com ---
     checkout_payload = {"payment_method": "credit_card", "address": "123 Test St"}
-    checkout_response = client.post("/api/checkout/cartupdate@example.com", json=checkout_payload)
+    checkout_response = call("POST", "/api/checkout/cartupdate@example.com", json=checkout_payload)
     assert checkout_response.status_code == 200, "Checkout should succeed after valid cart update."
 
     # --- Retrieve and Print All Orders ---
-    orders_response = client.get("/api/orders")
+    orders_response = call("GET", "/api/orders")
 
     assert orders_response.status_code == 200, "Retrieving all orders should succeed."
 
-def test_regression_validate_cart_valid(client):
+@pytest.mark.parametrize("stock, cart_quantity, expected_valid", [
+    (8, 4, True),   # cart fits the available inventory
+    (2, 3, False),  # cart asks for more than is in stock
+], ids=["valid", "exceeds_stock"])
+def test_regression_validate_cart(call, seed_chair, stock, cart_quantity, expected_valid):
     """
-    Regression Test: Ensure that a valid cart continues to validate correctly.
+    Regression Test: Ensure that a cart validates only while its quantities fit the available inventory.
     """
-    test_email = "regression_valid@example.com"
-    
-    client.post("/api/users", json={
-        "email": test_email,
-        "name": "Regression Valid User",
-        "password": "regpass"
-    })
+    test_email = "regression_validate@example.com"  # registered by the session seed_users fixture
 
-    post_response = client.post("/api/inventory", json={
-        "type": "Chair",
-        "name": "Regression Valid Chair",
-        "description": "A chair for regression valid test",
-        "price": 100,
-        "dimensions": [40, 40, 90],
-        "quantity": 8,
-        "cushion_material": "fabric"
-    })
-    furniture_id = post_response.get_json()["id"]
-
-    client.put(f"/api/cart/{test_email}", json={
-        "items": [{"furniture_id": furniture_id, "quantity": 4, "unit_price": 100}]
-    })
-
-    get_response = client.get(f"/api/checkout/{test_email}/validate")
-    data = get_response.get_json()
-    assert data["cart_valid"], "Expected cart_valid to be True."
-
-def test_regression_validate_cart_invalid(client):
-    """
-    Regression Test: Ensure that a cart with quantities exceeding available inventory is flagged as invalid.
-    """
-    test_email = "regression_invalid@example.com"
-    
-    client.post("/api/users", json={
-        "email": test_email,
-        "name": "Regression Invalid User",
-        "password": "regpass"
-    })
+    furniture_id = seed_chair(price=100, qty=stock, name="Regression Validate Chair").id
 
-    post_response = client.post("/api/inventory", json={
-        "type": "Chair",
-        "name": "Regression Invalid Chair",
-        "description": "A chair for regression invalid test",
-        "price": 100,
-        "dimensions": [40, 40, 90],
-        "quantity": 2,
-        "cushion_material": "fabric"
+    call("PUT", f"/api/cart/{test_email}", json={
+        "items": [{"furniture_id": furniture_id, "quantity": cart_quantity, "unit_price": 100}]
     })
-    furniture_id = post_response.get_json()["id"]
 
-    client.put(f"/api/cart/{test_email}", json={
-        "items": [{"furniture_id": furniture_id, "quantity": 3, "unit_price": 100}]
-    })
-
-    get_response = client.get(f"/api/checkout/{test_email}/validate")
+    get_response = call("GET", f"/api/checkout/{test_email}/validate")
     data = get_response.get_json()
-    assert not data["cart_valid"], "Expected cart_valid to be False."
-
+    assert data["cart_valid"] is expected_valid, f"Expected cart_valid to be {expected_valid}."
@@ -1,79 +1,60 @@
-import uuid
 import os
+import bcrypt
+import hashlib
+import orjson
 import pandas as pd
 import pytest
-from app import app
-
-# Fixture for Flask test client
-@pytest.fixture
-def client():
-    app.config["TESTING"] = True
-    with app.test_client() as client:
-        yield client
+from Catalog import LeafItem, ShoppingCart, User
 
 def test_get_furniture(client):
     """Ensure GET /api/furniture returns a 200 status code."""
     response = client.get("/api/furniture")
     assert response.status_code == 200
 
-def test_register_and_delete_user(client):
+def test_register_and_delete_user(client, unique_email):
     """
-    Register a new user via POST /api/users, confirm the user appears in GET /api/users,
+    Register a new user via POST /api/users, confirm the user is stored,
     then delete the user via DELETE /api/users/<email> and verify deletion.
     """
-    unique_email = f"test_{uuid.uuid4()}@example.com"
+    email = unique_email("test")
     
     # Register the user.
     response = client.post("/api/users", json={
-        "email": unique_email,
+        "email": email,
         "name": "Test User",
         "password": "password123"
     })
     assert response.status_code == 201, f"Expected 201, got {response.status_code}"
     
     # Verify user exists.
-    response = client.get("/api/users")
-    users = response.get_json()
-    assert any(u["email"] == unique_email for u in users), "User not found after registration."
+    assert email in User._users, "User not found after registration."
+    assert User._users[email].name == "Test User"
     
     # Delete the user.
-    response = client.delete(f"/api/users/{unique_email}")
+    response = client.delete(f"/api/users/{email}")
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     
     # Confirm deletion.
-    response = client.get("/api/users")
-    users = response.get_json()
-    assert not any(u["email"] == unique_email for u in users), "User still exists after deletion."
+    assert email not in User._users, "User still exists after deletion."
 
-def test_create_order(client):
+def test_duplicate_user_registration(client, registered_user):
     """
-    Create a furniture item (via POST /api/inventory), register a user, then create an order via POST /api/orders.
+    Registering an email that is already taken is rejected with 400 and leaves the stored user alone.
+    """
+    stored = User._users[registered_user]
+    response = client.post("/api/users", json={"email": registered_user, "name": "Impostor", "password": "other"})
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+    assert "already exists" in response.get_json()["error"]
+    assert User._users[registered_user] is stored
+
+def test_create_order(client, seed_chair, registered_user):
+    """
+    Seed a chair, register a user, then create an order via POST /api/orders.
     Verify that the order is created (status code 201 and order_id exists).
     """
-    # Create a furniture item.
-    inv_response = client.post("/api/inventory", json={
-        "id": 1,
-        "type": "Chair",
-        "name": "Test Chair",
-        "description": "A test chair for order creation",
-        "price": 75.0,
-        "dimensions": [30, 30, 30],
-        "quantity": 5,
-        "cushion_material": "foam"
-    })
-    assert inv_response.status_code == 201, f"Furniture creation failed: {inv_response.status_code}"
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
-    assert furniture_id is not None, "Furniture id not returned"
+    furniture_id = seed_chair(price=75.0, qty=5, name="Test Chair").id
 
-    # Register a new user.
-    user_email = f"orderuser_{uuid.uuid4()}@example.com"
-    user_response = client.post("/api/users", json={
-        "email": user_email,
-        "name": "Order User",
-        "password": "orderpassword"
-    })
-    assert user_response.status_code == 201, f"User registration failed: {user_response.status_code}"
+    user_email = registered_user
 
     # Create an order.
     order_response = client.post("/api/orders", json={
@@ -117,19 +98,19 @@ def test_search(client):
     assert result_item["name"] == "Search Chair"
     assert result_item["price"] == 80.0
 
-def test_update_profile(client):
+def test_update_profile(client, unique_email):
     """
     Register a user and then update their profile via POST /api/users/<email>/profile.
     Verify that the changes persist.
     """
-    unique_email = f"update_{uuid.uuid4()}@example.com"
+    email = unique_email("update")
     response = client.post("/api/users", json={
-        "email": unique_email,
+        "email": email,
         "name": "Old Name",
         "password": "updatepass"
     })
     assert response.status_code == 201
-    response = client.post(f"/api/users/{unique_email}/profile", json={
+    response = client.post(f"/api/users/{email}/profile", json={
         "name": "New Name",
         "address": "123 New Address"
     })
@@ -138,26 +119,13 @@ def test_update_profile(client):
     assert data["name"] == "New Name"
     assert data["address"] == "123 New Address"
 
-def test_update_cart(client):
+def test_update_cart(client, unique_email, sample_chair):
     """
-    Create a furniture item via POST /api/inventory and then update a shopping cart via PUT /api/cart/<email>.
+    Put the shared chair in a cart and then update it via PUT /api/cart/<email>.
     Verify that the cart reflects the changes.
     """
-    email = f"cartupdate_{uuid.uuid4()}@example.com"
-    # Create a furniture item.
-    inv_response = client.post("/api/inventory", json={
-        "id": 3,
-        "type": "Chair",
-        "name": "Cart Chair",
-        "description": "A chair for cart update",
-        "price": 100.0,
-        "dimensions": [40, 40, 90],
-        "quantity": 10,
-        "cushion_material": "foam"
-    })
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+    email = unique_email("cartupdate")
+    furniture_id = sample_chair.id
     # Create initial cart.
     response = client.put(f"/api/cart/{email}", json={
         "items": [{"furniture_id": furniture_id, "quantity": 3}]
@@ -167,30 +135,19 @@ def test_update_cart(client):
     assert data["user_email"] == email
     # Update the cart with new quantity.
     response = client.put(f"/api/cart/{email}", json={
-        "items": [{"furniture_id": furniture_id, "quantity": 5, "unit_price": 100.0}]
+        "items": [{"furniture_id": furniture_id, "quantity": 5, "unit_price": 150.0}]
     })
     assert response.status_code == 200
     data = response.get_json()
-    assert any(item["furniture_id"] == furniture_id and item["quantity"] == 5 for item in data["items"])
+    quantities = {item["furniture_id"]: item["quantity"] for item in data["items"]}
+    assert quantities[furniture_id] == 5
 
-def test_update_inventory(client):
+def test_update_inventory(client, inventory_item):
     """
-    Create a furniture item via POST /api/inventory and then update it via PUT /api/inventory/<furniture_id>.
+    Seed a table and then update it via PUT /api/inventory/<furniture_id>.
     Verify that the update is reflected.
     """
-    inv_response = client.post("/api/inventory", json={
-        "id": 4,
-        "type": "Table",
-        "name": "Test Table",
-        "description": "A test table",
-        "price": 150.0,
-        "dimensions": [50, 50, 30],
-        "quantity": 8,
-        "frame_material": "wood"
-    })
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+    furniture_id = inventory_item("Table", price=150.0, qty=8, name="Test Table", dimensions=(50, 50, 30), extra="wood").id
     response = client.put(f"/api/inventory/{furniture_id}", json={
         "price": 180.0,
         "name": "Updated Table"
@@ -200,26 +157,13 @@ def test_update_inventory(client):
     assert data["price"] == 180.0
     assert data["name"] == "Updated Table"
 
-def test_delete_cart_item(client):
+def test_delete_cart_item(client, unique_email, sample_chair):
     """
     Create a shopping cart via PUT /api/cart/<email> and then delete an item via DELETE /api/cart/<email>/<item_id>.
     Verify successful deletion.
     """
-    email = f"cartdelete_{uuid.uuid4()}@example.com"
-    # Create a furniture item.
-    inv_response = client.post("/api/inventory", json={
-        "id": 5,
-        "type": "Chair",
-        "name": "Delete Chair",
-        "description": "A chair for deletion from cart",
-        "price": 85.0,
-        "dimensions": [35, 35, 90],
-        "quantity": 5,
-        "cushion_material": "foam"
-    })
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+    email = unique_email("cartdelete")
+    furniture_id = sample_chair.id
     # Create a cart.
     response = client.put(f"/api/cart/{email}", json={
         "items": [{"furniture_id": furniture_id, "quantity": 2}]
@@ -231,25 +175,48 @@ def test_delete_cart_item(client):
     data = response.get_json()
     assert "Item removed" in data["message"]
 
-def test_delete_inventory(client):
+def test_delete_cart_item_not_in_cart(client, unique_email):
     """
-    Create a furniture item via POST /api/inventory, then delete it via DELETE /api/inventory/<furniture_id>.
-    Afterwards, ensure that an update to the deleted item returns 404.
+    Create a shopping cart and try to delete an item id that is not in it.
+    Expect a 404 response and the cart left untouched.
     """
-    inv_response = client.post("/api/inventory", json={
-        "id": 6,
-        "type": "Chair",
-        "name": "Delete Inventory Chair",
-        "description": "Chair to be deleted",
-        "price": 95.0,
-        "dimensions": [40, 40, 90],
-        "quantity": 1,
-        "cushion_material": "foam"
+    email = unique_email("cartdelete_missing")
+    response = client.put(f"/api/cart/{email}", json={
+        "items": [{"furniture_id": 4242, "quantity": 1, "unit_price": 10.0}]
     })
+    assert response.status_code == 200
+    response = client.delete(f"/api/cart/{email}/4243")
+    assert response.status_code == 404
+    response = client.delete(f"/api/cart/{email}/04242")
+    assert response.status_code == 200
 
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+def test_shopping_cart_update_and_deletion():
+    """
+    Drive ShoppingCart directly through adding, discounting and removing items; the HTTP
+    routes on top of it are covered by test_update_cart and test_delete_cart_item.
+    """
+    cart = ShoppingCart(name="direct@example.com")
+    chair = LeafItem(name="101", unit_price=100.0, quantity=3)
+    lamp = LeafItem(name="102", unit_price=50.0, quantity=1)
+    cart.add_item(chair)
+    cart.add_item(lamp)
+    assert cart.get_total_price() == pytest.approx(350.0 * 1.18)
+
+    cart.apply_discount(50, target=chair)
+    assert cart.get_total_price() == pytest.approx(200.0 * 1.18)
+
+    assert cart.root.remove_by_name("101")
+    assert not cart.root.remove_by_name("101")
+    cart.remove_item(lamp)
+    assert cart.view_cart() == "Shopping cart is empty."
+    assert cart.get_total_price() == 0
+
+def test_delete_inventory(client, seed_chair):
+    """
+    Seed a chair, then delete it via DELETE /api/inventory/<furniture_id>.
+    Afterwards, ensure that an update to the deleted item returns 404.
+    """
+    furniture_id = seed_chair(price=95.0, qty=1, name="Delete Inventory Chair").id
     response = client.delete(f"/api/inventory/{furniture_id}")
     assert response.status_code == 200
     data = response.get_json()
@@ -258,26 +225,13 @@ def test_delete_inventory(client):
     response = client.put(f"/api/inventory/{furniture_id}", json={"price": 100.0})
     assert response.status_code == 404
 
-def test_leafitem_discount_within_limits(client):
+def test_leafitem_discount_within_limits(client, unique_email, inventory_item):
     """
     Use PUT /api/cart/<email> to add an item with a discount (0<=discount<=100) and verify that
     the discount is applied correctly.
     """
-    email = f"discount_{uuid.uuid4()}@example.com"
-    # Create a furniture item.
-    inv_response = client.post("/api/inventory", json={
-        "id": 7,
-        "type": "Lamp",
-        "name": "Discount Lamp",
-        "description": "Lamp for discount test",
-        "price": 200.0,
-        "dimensions": [20, 20, 40],
-        "quantity": 5,
-        "light_source": "LED"
-    })
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+    email = unique_email("discount")
+    furniture_id = inventory_item("Lamp", price=200.0, qty=5, name="Discount Lamp", dimensions=(20, 20, 40), extra="LED").id
     # Update cart with a discount of 50%
     response = client.put(f"/api/cart/{email}", json={
         "items": [{"furniture_id": furniture_id, "quantity": 1, "discount": 50, "unit_price": 200.0}]
@@ -287,72 +241,56 @@ def test_leafitem_discount_within_limits(client):
     # After a 50% discount, price should be 100.
     assert data["total_price"] == 118.0
 
-def test_leafitem_discount_over_100(client):
+@pytest.mark.parametrize("percentage, expected", [(0, 200.0), (50, 100.0), (100, 0.0)])
+def test_leafitem_apply_discount(percentage, expected):
+    """
+    LeafItem.apply_discount takes the percentage off the original unit price.
+    """
+    item = LeafItem("Test Lamp", 200.0, quantity=1)
+    item.apply_discount(percentage)
+    assert item.get_price() == expected
+
+def test_leafitem_discount_over_100(client, unique_email, inventory_item):
     """
     Use PUT /api/cart/<email> to add an item with a discount >100%.
     Expect a 400 error.
     """
-    email = f"discount_fail_{uuid.uuid4()}@example.com"
-    inv_response = client.post("/api/inventory", json={
-        "id": 8,
-        "type": "Lamp",
-        "name": "OverDiscount Lamp",
-        "description": "Lamp for discount failure test",
-        "price": 200.0,
-        "dimensions": [20, 20, 40],
-        "quantity": 5,
-        "light_source": "LED"
-    })
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+    email = unique_email("discount_fail")
+    furniture_id = inventory_item("Lamp", price=200.0, qty=5, name="OverDiscount Lamp", dimensions=(20, 20, 40), extra="LED").id
     response = client.put(f"/api/cart/{email}", json={
         "items": [{"furniture_id": furniture_id, "quantity": 1, "discount": 150, "unit_price": 200.0}]
     })
     assert response.status_code == 400
 
-def test_checkout_missing_fields(client):
+def test_checkout_missing_fields(client, registered_user):
     """
     Call POST /api/checkout/<email> with missing payment_method and address,
     expecting a 400 response.
     """
-    email = f"checkout_missing_{uuid.uuid4()}@example.com"
-    # Register user and create an empty cart.
-    user_response = client.post("/api/users", json={
-        "email": email,
-        "name": "Checkout Missing",
-        "password": "pass"
-    })
-    assert user_response.status_code == 201
+    email = registered_user
     cart_response = client.put(f"/api/cart/{email}", json={"items": []})
     assert cart_response.status_code == 200
     response = client.post(f"/api/checkout/{email}", json={})
     assert response.status_code == 400
 
-def test_checkout_no_shopping_cart(client):
+def test_checkout_no_shopping_cart(client, registered_user):
     """
-    Register a user (via /api/users) without creating a cart, then call checkout.
+    Take a registered user without a cart and call checkout.
     Expect a 404 response.
     """
-    email = f"checkout_nocart_{uuid.uuid4()}@example.com"
-    user_response = client.post("/api/users", json={
-        "email": email,
-        "name": "No Cart",
-        "password": "pass"
-    })
-    assert user_response.status_code == 201
+    email = registered_user
     response = client.post(f"/api/checkout/{email}", json={
         "payment_method": "credit_card",
         "address": "123 Checkout St"
     })
     assert response.status_code == 404
 
-def test_checkout_no_user(client):
+def test_checkout_no_user(client, unique_email):
     """
     Create a cart for a user that is not registered, then call checkout.
     Expect a 404 response.
     """
-    email = f"checkout_nouser_{uuid.uuid4()}@example.com"
+    email = unique_email("checkout_nouser")
     cart_response = client.put(f"/api/cart/{email}", json={"items": []})
     assert cart_response.status_code == 200
     response = client.post(f"/api/checkout/{email}", json={
@@ -361,18 +299,12 @@ def test_checkout_no_user(client):
     })
     assert response.status_code == 404
 
-def test_checkout_finalization_failure(client):
+def test_checkout_finalization_failure(client, registered_user):
     """
     Create a cart with an item that does not correspond to any existing furniture in inventory.
     Expect checkout to fail (400).
     """
-    email = f"checkout_fail_{uuid.uuid4()}@example.com"
-    user_response = client.post("/api/users", json={
-        "email": email,
-        "name": "Checkout Fail",
-        "password": "pass"
-    })
-    assert user_response.status_code == 201
+    email = registered_user
     # Add a cart item with a furniture_id that doesn't exist .
     cart_response = client.put(f"/api/cart/{email}", json={
         "items": [{"furniture_id": -1, "quantity": 1, "unit_price": 100.0}]
@@ -384,32 +316,13 @@ def test_checkout_finalization_failure(client):
     })
     assert response.status_code == 400
 
-def test_checkout_success(client):
+def test_checkout_success(client, seed_chair, registered_user):
     """
-    Create a furniture item via /api/inventory, register a user, create a cart with the item,
-    and perform a successful checkout.
+    Seed a chair, put it in a registered user's cart and perform a successful checkout.
     Expect a 200 response and a valid order summary.
     """
-    email = f"checkout_success_{uuid.uuid4()}@example.com"
-    user_response = client.post("/api/users", json={
-        "email": email,
-        "name": "Checkout Success",
-        "password": "pass"
-    })
-    assert user_response.status_code == 201
-    inv_response = client.post("/api/inventory", json={
-        "id": 9,
-        "type": "Chair",
-        "name": "Success Chair",
-        "description": "Chair for checkout success test",
-        "price": 150.0,
-        "dimensions": [40, 40, 90],
-        "quantity": 10,
-        "cushion_material": "foam"
-    })
-    assert inv_response.status_code == 201
-    furniture_data = inv_response.get_json()
-    furniture_id = furniture_data.get("id")
+    email = registered_user
+    furniture_id = seed_chair(price=150.0, qty=10, name="Success Chair").id
     cart_response = client.put(f"/api/cart/{email}", json={
         "items": [{"furniture_id": furniture_id, "quantity": 1, "unit_price": 150.0}]
     })
@@ -459,20 +372,12 @@ def test_get_quantity_non_existing_item(client):
     data = get_response.get_json()
     assert "error" in data, "Expected error message in response"
 
-def test_view_cart_existing_cart(client):
+def test_view_cart_existing_cart(client, registered_user):
     """
     Unit Test: Verify that GET /api/cart/<email>/view returns the formatted cart contents
     when a shopping cart exists for the user.
     """
-    test_email = "viewcartuser@example.com"
-    
-    # Register the user (if not already registered)
-    reg_response = client.post("/api/users", json={
-        "email": test_email,
-        "name": "View Cart User",
-        "password": "testpass"
-    })
-    assert reg_response.status_code == 201, f"User registration failed: {reg_response.status_code}"
+    test_email = registered_user
 
     # Add an item to the user's shopping cart.
     # (Assuming furniture with id 1038 exists in inventory)
@@ -505,39 +410,20 @@ def test_view_cart_non_existing_cart(client):
     data = get_response.get_json()
     assert "error" in data, "Expected an error message when cart does not exist"
 
-def test_validate_cart_valid(client):
+def test_validate_cart_valid(client, seed_chair, registered_user):
     """
     Unit Test: Verify that the cart is valid when the requested quantities are within available inventory.
     
     Steps:
       1. Register a user.
-      2. Create a furniture item (e.g. a Chair) with a sufficient quantity in inventory.
+      2. Stock a Chair with a sufficient quantity in inventory.
       3. Update the user's cart with a quantity less than or equal to what's available.
       4. Call the GET /api/checkout/<email>/validate endpoint and check that "cart_valid" is True.
     """
-    test_email = "validcart@example.com"
-    
-    # Register the user.
-    reg_response = client.post("/api/users", json={
-        "email": test_email,
-        "name": "Valid Cart User",
-        "password": "testpass"
-    })
-    assert reg_response.status_code == 201
+    test_email = registered_user
 
-    # Create a furniture item with quantity 10.
-    post_response = client.post("/api/inventory", json={
-        "type": "Chair",
-        "name": "Valid Cart Chair",
-        "description": "A chair for valid cart test",
-        "price": 100,
-        "dimensions": [40, 40, 90],
-        "quantity": 10,
-        "cushion_material": "leather"
-    })
-    assert post_response.status_code == 201
-    furniture_item = post_response.get_json()
-    furniture_id = furniture_item["id"]
+    # Stock a chair with quantity 10.
+    furniture_id = seed_chair(price=100, qty=10, name="Valid Cart Chair").id
 
     # Update the user's cart with a quantity of 5 (within the available 10).
     put_response = client.put(f"/api/cart/{test_email}", json={
@@ -551,39 +437,20 @@ def test_validate_cart_valid(client):
     data = get_response.get_json()
     assert data["cart_valid"], f"Expected cart_valid to be True, got {data['cart_valid']}"
 
-def test_validate_cart_invalid(client):
+def test_validate_cart_invalid(client, seed_chair, registered_user):
     """
     Unit Test: Verify that the cart is invalid when the requested quantities exceed available inventory.
     
     Steps:
       1. Register a user.
-      2. Create a furniture item (e.g. a Chair) with a limited quantity in inventory.
+      2. Stock a Chair with a limited quantity in inventory.
       3. Update the user's cart with a quantity greater than what's available.
       4. Call the GET /api/checkout/<email>/validate endpoint and check that "cart_valid" is False.
     """
-    test_email = "invalidcart@example.com"
-    
-    # Register the user.
-    reg_response = client.post("/api/users", json={
-        "email": test_email,
-        "name": "Invalid Cart User",
-        "password": "testpass"
-    })
-    assert reg_response.status_code == 201
+    test_email = registered_user
 
-    # Create a furniture item with quantity 3.
-    post_response = client.post("/api/inventory", json={
-        "type": "Chair",
-        "name": "Invalid Cart Chair",
-        "description": "A chair for invalid cart test",
-        "price": 100,
-        "dimensions": [40, 40, 90],
-        "quantity": 3,
-        "cushion_material": "foam"
-    })
-    assert post_response.status_code == 201
-    furniture_item = post_response.get_json()
-    furniture_id = furniture_item["id"]
+    # Stock a chair with quantity 3.
+    furniture_id = seed_chair(price=100, qty=3, name="Invalid Cart Chair").id
 
     # Update the user's cart with a quantity of 4 (exceeding available quantity).
     put_response = client.put(f"/api/cart/{test_email}", json={
@@ -597,21 +464,13 @@ def test_validate_cart_invalid(client):
     data = get_response.get_json()
     assert not data["cart_valid"], f"Expected cart_valid to be False, got {data['cart_valid']}"
 
-def test_process_payment_success(client):
+def test_process_payment_success(client, registered_user):
     """
     Unit Test: Verify that POST /api/checkout/<email>/payment returns a successful payment
     when a valid payment_method is provided.
     """
-    test_email = "paymentuser@example.com"
-    
-    # Register the user.
-    reg_response = client.post("/api/users", json={
-        "email": test_email,
-        "name": "Payment User",
-        "password": "paymentpass"
-    })
-    assert reg_response.status_code == 201, f"User registration failed: {reg_response.status_code}"
-    
+    test_email = registered_user
+
     # Update the cart with an item.
     put_response = client.put(f"/api/cart/{test_email}", json={
         "items": [{"furniture_id": 1038, "quantity": 2, "unit_price": 100}]
@@ -626,21 +485,13 @@ def test_process_payment_success(client):
     data = payment_response.get_json()
     assert data.get("payment_success") is True, "Expected payment_success to be True"
 
-def test_process_payment_missing_method(client):
+def test_process_payment_missing_method(client, registered_user):
     """
     Unit Test: Verify that POST /api/checkout/<email>/payment returns a 400 error
     when the payment_method is missing.
     """
-    test_email = "paymentmissing@example.com"
-    
-    # Register the user.
-    reg_response = client.post("/api/users", json={
-        "email": test_email,
-        "name": "Missing Payment User",
-        "password": "missingpass"
-    })
-    assert reg_response.status_code == 201, f"User registration failed: {reg_response.status_code}"
-    
+    test_email = registered_user
+
     # Update the cart with an item.
     put_response = client.put(f"/api/cart/{test_email}", json={
         "items": [{"furniture_id": 1038, "quantity": 2, "unit_price": 100}]
@@ -653,15 +504,12 @@ def test_process_payment_missing_method(client):
     data = payment_response.get_json()
     assert "error" in data, "Expected an error message when payment method is missing"
 
-def test_collect_leaf_items_existing_cart(client):
+def test_collect_leaf_items_existing_cart(client, registered_user):
     """
     Unit Test: Verify that GET /api/checkout/<email>/leaf_items returns a list of leaf items
     when the shopping cart contains items.
     """
-    email = "leafitemsuser@example.com"
-    # Register the user.
-    reg_response = client.post("/api/users", json={"email": email, "name": "Leaf Items User", "password": "leafpass"})
-    assert reg_response.status_code == 201
+    email = registered_user
 
     # Update the shopping cart with an item.
     put_response = client.put(f"/api/cart/{email}", json={"items": [{"furniture_id": 1038, "quantity": 3, "unit_price": 100}]})
@@ -693,32 +541,20 @@ def test_collect_leaf_items_no_cart(client):
     data = get_response.get_json()
     assert "error" in data
 
-def test_find_furniture_by_name_success(client):
+def test_find_furniture_by_name_success(client, seed_chair, registered_user):
     """
     Unit Test: Verify that GET /api/checkout/<email>/find_furniture returns the correct
     furniture details when a matching furniture item exists.
     """
-    email = "findfurnitureuser@example.com"
-    # Register the user.
-    reg_response = client.post("/api/users", json={"email": email, "name": "Find Furniture User", "password": "findpass"})
-    assert reg_response.status_code == 201
+    email = registered_user
 
-    # Create a furniture item with a known name.
-    post_response = client.post("/api/inventory", json={
-        "type": "Chair",
-        "name": "Test Find Furniture Chair",
-        "description": "Chair for find furniture test",
-        "price": 120.0,
-        "dimensions": [40, 40, 90],
-        "quantity": 5,
-        "cushion_material": "fabric"
-    })
-    assert post_response.status_code == 201
+    # Stock a chair with a known name.
+    furniture_id = seed_chair(price=120.0, qty=5, name="Test Find Furniture Chair").id
 
     # Update the user's shopping cart (even if the cart is not used by the _find_furniture_by_name logic,
     # the endpoint requires a cart to exist).
     put_response = client.put(f"/api/cart/{email}", json={
-        "items": [{"furniture_id": post_response.get_json()["id"], "quantity": 1, "unit_price": 120}]
+        "items": [{"furniture_id": furniture_id, "quantity": 1, "unit_price": 120}]
     })
     assert put_response.status_code == 200
 
@@ -729,15 +565,12 @@ def test_find_furniture_by_name_success(client):
     assert data["name"] == "Test Find Furniture Chair"
     assert data["quantity"] >= 1
 
-def test_find_furniture_by_name_not_found(client):
+def test_find_furniture_by_name_not_found(client, registered_user):
     """
     Unit Test: Verify that GET /api/checkout/<email>/find_furniture returns a 404 error
     when no furniture item matches the given name.
     """
-    email = "findfurnaturenotfound@example.com"
-    # Register the user.
-    reg_response = client.post("/api/users", json={"email": email, "name": "Not Found User", "password": "notfoundpass"})
-    assert reg_response.status_code == 201
+    email = registered_user
 
     # Create an empty shopping cart for the user.
     put_response = client.put(f"/api/cart/{email}", json={"items": []})
@@ -871,12 +704,12 @@ def test_check_password_success(client):
 
 def test_hash_password(client):
     """
-    Test that the password hashing endpoint produces consistent results.
+    Test that the password hashing endpoint produces salted bcrypt hashes.
     
     Steps:
       1. Send a password to be hashed.
       2. Send the same password again.
-      3. Verify that both responses produce identical hashes.
+      3. Verify that both hashes differ (fresh salt) but both verify against the password.
     """
     password = "testpassword"
     
@@ -886,15 +719,34 @@ def test_hash_password(client):
     data1 = response1.get_json()
     assert "hashed_password" in data1
 
-    # Second request to hash the same password to check consistency
+    # Second request to hash the same password
     response2 = client.post("/api/hash_password", json={"password": password})
     assert response2.status_code == 200
     data2 = response2.get_json()
 
-    # Verify both hashes are identical
-    assert data1["hashed_password"] == data2["hashed_password"]
+    # Each hash gets its own salt, yet both match the password
+    assert data1["hashed_password"] != data2["hashed_password"]
+    for hashed in (data1["hashed_password"], data2["hashed_password"]):
+        assert bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+def test_register_hashes_password_once(client, unique_email):
+    """
+    Test that registration stores a single hash of the password.
+
+    The hash returned by POST /api/users must verify against the raw password;
+    hashing the password twice on the registration path would make it fail.
+    """
+    password = "hashedonce"
+    reg_resp = client.post("/api/users", json={
+        "email": unique_email("hashonce"),
+        "name": "Hash Once",
+        "password": password
+    })
+    assert reg_resp.status_code == 201
+    stored_hash = reg_resp.get_json()["password_hash"]
+    assert bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
 
-def test_set_order_status_success(client):
+def test_set_order_status_success(client, registered_user):
     """
     Test that the order status can be successfully updated.
     
@@ -906,13 +758,7 @@ def test_set_order_status_success(client):
       5. Verify that the response confirms the status update.
     """
 
-    # Register a user
-    email = f"order_status_{uuid.uuid4()}@example.com"
-    client.post("/api/users", json={
-        "email": email,
-        "name": "Order Status User",
-        "password": "password"
-    })
+    email = registered_user
 
     # Create a furniture item
     inv_response = client.post("/api/inventory", json={
@@ -942,7 +788,7 @@ def test_set_order_status_success(client):
     data = update_resp.get_json()
     assert "Order status updated successfully" in data["message"]
 
-def test_get_order_status_success(client):
+def test_get_order_status_success(client, registered_user):
     """
     Test that the order status retrieval endpoint returns the correct order status.
     
@@ -953,13 +799,7 @@ def test_get_order_status_success(client):
       4. Retrieve the order status using the GET endpoint.
       5. Verify that the response includes the correct order_id and default status.
     """
-    # Register a user
-    email = f"getstatus@example.com"
-    client.post("/api/users", json={
-        "email": email,
-        "name": "Get Status User",
-        "password": "password"
-    })
+    email = registered_user
 
     # Create a furniture item
     inv_response = client.post("/api/inventory", json={
@@ -991,13 +831,13 @@ def test_get_order_status_success(client):
     assert data["status"] == "PENDING"  # Default status
 
 
-def test_user_order_history_endpoint(client):
+def test_user_order_history_endpoint(client, unique_email):
     """
     Test creating a user, creating an inventory item and an order (which appends an order
     to the user's order history), and then verifying the response.
     """
     # Create a unique test user via the API.
-    email = f"orderhistory_{uuid.uuid4()}@example.com"
+    email = unique_email("orderhistory")
     response = client.post("/api/users", json={
         "email": email,
         "name": "Order History Test User",
@@ -1036,3 +876,238 @@ def test_user_order_history_endpoint(client):
     assert "order_history" in data, "order_history key missing in response"
     assert len(data["order_history"]) > 0, "Expected at least one order in history"
     assert len(data["order_history"]) > 0, "Expected at least one order in history"
+
+def test_inventory_rejects_bad_dimensions(client):
+    """
+    POST and PUT /api/inventory should return 400 unless dimensions has exactly three values.
+    """
+    response = client.post("/api/inventory", json={
+        "type": "Chair",
+        "name": "Flat Chair",
+        "description": "Chair with only two dimensions",
+        "price": 50.0,
+        "dimensions": [40, 40],
+        "quantity": 1
+    })
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+    assert response.get_json()["error"] == "dimensions must be length 3"
+
+    inv_response = client.post("/api/inventory", json={
+        "type": "Chair",
+        "name": "Dimension Test Chair",
+        "description": "Chair for dimension validation",
+        "price": 50.0,
+        "dimensions": [40, 40, 90],
+        "quantity": 1
+    })
+    assert inv_response.status_code == 201, f"Inventory creation failed: {inv_response.status_code}"
+    furniture_id = inv_response.get_json()["id"]
+
+    response = client.put(f"/api/inventory/{furniture_id}", json={"dimensions": [1, 2, 3, 4]})
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+    response = client.put(f"/api/inventory/{furniture_id}", json={"dimensions": [45, 45, 95]})
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.get_json()["dimensions"] == [45, 45, 95]
+
+@pytest.mark.parametrize("body, expected", [
+    ({"capacity": 3}, 3),
+    ({}, 1),
+    ({"cushion_material": 4}, 4),  # deprecated alias
+    ({"capacity": 3, "cushion_material": 4}, 3),
+], ids=["given", "default", "alias", "capacity_wins"])
+def test_create_sofa_sets_capacity(client, app_mod, body, expected):
+    """
+    A Sofa posted to /api/inventory takes its capacity from the request, the same field
+    (and default) used when a saved inventory is loaded.
+    """
+    response = client.post("/api/inventory", json={
+        "type": "Sofa", "name": "Capacity Sofa", "description": "Sofa with a capacity",
+        "price": 300.0, "dimensions": [200, 90, 100], "quantity": 1, **body,
+    })
+    assert response.status_code == 201
+    assert app_mod.inventory.get_by_id(response.get_json()["id"]).capacity == expected
+
+def test_order_status_unknown_order(client):
+    """
+    GET and PUT /api/orders/<order_id>/status should return 404 for an order id that was never issued.
+    """
+    response = client.get("/api/orders/999999/status")
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
+
+    response = client.put("/api/orders/999999/status", json={"status": "SHIPPED"})
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
+
+def test_register_users_bulk(client, unique_email):
+    """
+    POST /api/users/bulk registers every user in the batch, and rejects the whole batch
+    if any email is already taken.
+    """
+    emails = [unique_email("bulk") for _ in range(3)]
+    response = client.post("/api/users/bulk", json={
+        "users": [{"email": email, "name": "Bulk User", "password": "bulkpassword"} for email in emails]
+    })
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+    assert [u["email"] for u in response.get_json()] == emails
+
+    login = client.post("/api/login", json={"email": emails[1], "password": "bulkpassword"})
+    assert login.status_code == 200, f"Expected 200, got {login.status_code}"
+
+    new_email = unique_email("bulk")
+    response = client.post("/api/users/bulk", json={
+        "users": [
+            {"email": new_email, "password": "bulkpassword"},
+            {"email": emails[0], "password": "bulkpassword"},
+        ]
+    })
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+    by_email = {u["email"]: u for u in orjson.loads(client.get("/api/users").data)}
+    assert new_email not in by_email, "Partial batch was registered."
+
+def test_get_users_etag_and_invalidation(client, unique_email):
+    """
+    GET /api/users returns an ETag, answers 304 for a matching If-None-Match,
+    and serves a fresh listing once a user is registered.
+    """
+    first = client.get("/api/users")
+    assert first.status_code == 200
+    etag = first.headers.get("ETag")
+    assert etag, "ETag header missing"
+
+    cached = client.get("/api/users", headers={"If-None-Match": etag})
+    assert cached.status_code == 304, f"Expected 304, got {cached.status_code}"
+
+    email = unique_email("etag")
+    client.post("/api/users", json={"email": email, "name": "ETag User", "password": "etagpassword"})
+
+    fresh = client.get("/api/users", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200, f"Expected 200, got {fresh.status_code}"
+    assert fresh.headers.get("ETag") != etag
+    emails = {u["email"] for u in orjson.loads(fresh.data)}
+    assert email in emails, "New user missing from listing."
+
+def test_malformed_json_body(client):
+    """
+    A request body that is not valid JSON should be rejected with 400.
+    """
+    response = client.post("/api/users", data="{not json", content_type="application/json")
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+def test_login_accepts_legacy_sha256_hash(client, unique_email):
+    """
+    A user whose stored hash predates bcrypt (plain SHA-256 hex digest) can still log in.
+    """
+    email = unique_email("legacy")
+    # register_user returns the stored instance, so its hash can be swapped without looking it up again.
+    user = User.register_user("Legacy User", email, "legacypass")
+    user.password_hash = hashlib.sha256(b"legacypass").hexdigest()
+
+    response = client.post("/api/login", json={"email": email, "password": "legacypass"})
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    response = client.post("/api/login", json={"email": email, "password": "wrongpass"})
+    assert response.status_code != 200
+
+def test_create_order_repeated_item_checks_combined_stock(client, unique_email):
+    """
+    Two order lines for the same furniture must fit the stock together, and the
+    total is computed server-side from the inventory price.
+    """
+    email = unique_email("repeat")
+    client.post("/api/users", json={"email": email, "name": "Repeat User", "password": "repeatpass"})
+    inv_response = client.post("/api/inventory", json={
+        "type": "Chair",
+        "name": "Repeat Chair",
+        "description": "Chair ordered on several lines",
+        "price": 20.0,
+        "dimensions": [40, 40, 90],
+        "quantity": 5
+    })
+    furniture_id = inv_response.get_json()["id"]
+
+    response = client.post("/api/orders", json={
+        "user_email": email,
+        "items": [{"furniture_id": furniture_id, "quantity": 3}, {"furniture_id": furniture_id, "quantity": 3}]
+    })
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+    response = client.post("/api/orders", json={
+        "user_email": email,
+        "items": [{"furniture_id": furniture_id, "quantity": 2}, {"furniture_id": furniture_id, "quantity": 3}]
+    })
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+    assert response.get_json()["total_price"] == 100.0
+    quantity = client.get(f"/api/inventory/{furniture_id}/quantity").get_json()
+    assert quantity["quantity"] == 0
+
+def test_failed_background_write_is_logged(app_mod, real_persistence, tmp_path, caplog):
+    """
+    A frame that cannot be pickled is logged by the persistence thread and leaves no file behind.
+    """
+    df = pd.DataFrame({"value": [lambda: None]})
+    path = tmp_path / "inventory.pkl"
+    app_mod._schedule_write(df, str(path))
+    app_mod.flush_persistence()
+
+    assert f"Failed to persist {path}" in caplog.text
+    assert list(tmp_path.iterdir()) == []
+
+def test_save_inventory_with_short_dimensions(client, app_mod, inventory_item, real_persistence, tmp_path, monkeypatch):
+    """
+    An item whose dimensions are not a 3-tuple is saved with the missing columns empty, reloads
+    with its own dimensions, and does not stop later inventory changes from being saved.
+    """
+    flat = inventory_item(name="Flat Chair", dimensions=(40, 40))
+    full = inventory_item(name="Full Chair", dimensions=(40, 40, 90))
+    response = client.post("/api/inventory", json={
+        "type": "Chair", "name": "After Flat Chair", "description": "Created after a short-dimension item",
+        "price": 80.0, "dimensions": [40, 40, 90], "quantity": 1, "cushion_material": "foam"
+    })
+    assert response.status_code == 201
+
+    app_mod.save_inventory(app_mod.inventory, storage_dir=str(tmp_path))
+    app_mod.flush_persistence()
+
+    # Restore the shared singleton's state when the test ends.
+    inventory = app_mod.inventory
+    for attr in ("items", "_by_id", "_id_counter"):
+        monkeypatch.setattr(inventory, attr, getattr(inventory, attr))
+    inventory.load_inventory(storage_dir=str(tmp_path))
+    for original in (flat, full):
+        reloaded = inventory.get_by_id(original.id).dimensions
+        assert reloaded == original.dimensions
+        assert all(type(value) is int for value in reloaded)
+
+def test_load_inventory_migrates_dimensions_column(app_mod, real_persistence, tmp_path, monkeypatch):
+    """
+    An inventory file saved with a single 'dimensions' column still loads, and is re-saved
+    with dimensions split into dim_w/dim_h/dim_d.
+    """
+    pd.DataFrame([{
+        "id": 900, "name": "Legacy Chair", "description": "Saved before the column split",
+        "price": 60.0, "dimensions": (40, 45, 90), "class": "Chair", "quantity": 2
+    }]).to_pickle(tmp_path / "inventory.pkl")
+
+    # Restore the shared singleton's state when the test ends.
+    inventory = app_mod.inventory
+    for attr in ("items", "_by_id", "_id_counter"):
+        monkeypatch.setattr(inventory, attr, getattr(inventory, attr))
+
+    inventory.load_inventory(storage_dir=str(tmp_path))
+    chair = inventory.get_by_id(900)
+    assert chair is not None and chair.dimensions == (40, 45, 90)
+
+    app_mod.save_inventory(inventory, storage_dir=str(tmp_path))
+    app_mod.flush_persistence()
+    saved = pd.read_pickle(tmp_path / "inventory.pkl")
+    assert "dimensions" not in saved.columns
+    assert saved.loc[saved["id"] == 900, ["dim_w", "dim_h", "dim_d"]].values.tolist() == [[40, 45, 90]]
+
+def test_persisted_frames_load_on_first_access(app_mod):
+    """
+    The persisted DataFrames are module attributes that load on first access.
+    """
+    assert isinstance(app_mod.users_df, pd.DataFrame)
+    assert "email" in app_mod.users_df.columns
+    assert app_mod.users_df is app_mod.users_df
+    with pytest.raises(AttributeError):
+        app_mod.no_such_df
@@ -0,0 +1,7 @@
+# wsgi.py
+"""
+WSGI entry point for production servers, e.g. `gunicorn -c gunicorn.conf.py wsgi:application`.
+"""
+from app import app
+
+application = app